@@ -1,42 +1,628 @@
 # analysis.py
+import multiprocessing
 import os
-import openpyxl
-from stats_processing import process_stats, merge_stats, create_player_summary_df
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from game_stats import GAME_SHEETS, load_game_stats, sum_games
+from instrumentation import get_logger, stage_metrics, profiled, run_measured, write_metrics_file
+from season_archive import ARCHIVE_FOLDER, find_session, is_archived
+from session_catalog import session_sort_key
+from stats_cache import MISSING, game_cache, stats_cache
+from stats_db import SUMA_GAME, stats_db
+from stats_processing import load_workbook_stats, create_player_summary_df
+from stats_tensor import StatsTensor
 from plots import create_plots, create_trend_plot, create_player_trend_plots
 
-def analyze_stats(selected_files):
-    excel_folder = "excel"
-    if not os.path.exists(excel_folder):
-        return "Błąd: Folder 'excel' nie istnieje!", None, None, None, None, None, None, {}
-    
+logger = get_logger("analysis")
+
+# Liczba procesów parsujących pliki; None oznacza liczbę rdzeni
+INGEST_WORKERS = None
+# Źródło statystyk sesji: 'games' - suma zakładek 'game N' (bez zależności od zapisanych
+# wartości formuł), 'suma' - zakładka 'suma'
+INGEST_MODES = ('games', 'suma')
+INGEST_MODE = 'games'
+# Rozdzielczość wykresów trendów: kolejne sesje albo kolejne gry
+GRANULARITIES = ('session', 'game')
+
+# Liczba zapamiętanych wyników analizy (wykresy + tabela) dla różnych wyborów plików
+FIGURE_CACHE_SIZE = 16
+# Liczba zapamiętanych stanów analizy, od których można liczyć zmiany wyboru przyrostowo
+ANALYSIS_STATE_SIZE = 4
+
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    """Zwraca współdzieloną pulę procesów o rozmiarze workers, tworząc ją przy pierwszym użyciu.
+
+    Rozmiar puli nie zależy od liczby zadań - pula uruchamia procesy dopiero, gdy są
+    potrzebne, więc małe wywołania nie tworzą jej od nowa. Nowa pula powstaje tylko
+    przy zmianie skonfigurowanej liczby procesów albo po awarii poprzedniej.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # 'spawn' - fork wielowątkowego serwera Gradio nie jest bezpieczny
+            _pool = ProcessPoolExecutor(max_workers=workers,
+                                        mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers = workers
+        return _pool
+
+
+def _reset_pool(pool):
+    """Porzuca pulę pool, jeśli nadal jest pulą współdzieloną (inny wątek mógł już utworzyć nową)"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _parse_file(file_path):
+    # Uruchamiane w procesie potomnym - zwracamy zwykłe słowniki, które da się przesłać
+    player_stats = load_workbook_stats(file_path)
+    if player_stats is None:
+        return None
+    return {player: dict(stats) for player, stats in player_stats.items()}
+
+
+def _parse_game(file_path, sheet_name):
+    # Jedna zakładka gry - osobne zadanie, więc gry jednego pliku parsują się równolegle
+    player_stats = load_game_stats(file_path, sheet_name)
+    if player_stats is None:
+        return None
+    return {player: dict(stats) for player, stats in player_stats.items()}
+
+
+def _cached_results(cache, file_paths):
+    """Wyniki z cache'u w kolejności file_paths, błędy odczytu i {indeks: klucz} plików do sparsowania"""
+    results = [None] * len(file_paths)
+    errors = {}
+    pending = {}
+    for i, file_path in enumerate(file_paths):
+        try:
+            value, key = cache.get(file_path)
+        except OSError as e:
+            errors[file_path] = str(e)
+            continue
+        if value is MISSING:
+            pending[i] = key
+        else:
+            results[i] = value
+    return results, errors, pending
+
+
+def _run_tasks(fn, tasks, workers):
+    """Wykonuje fn(*args) dla każdego zadania - w puli procesów albo, dla jednego procesu, na miejscu.
+
+    Zwraca listę par (wynik, komunikat błędu) w kolejności zadań.
+    """
+    workers = workers or os.cpu_count() or 1
+    stage_metrics.increment('parse_tasks', len(tasks))
+    if min(workers, len(tasks)) <= 1:
+        # Jedno zadanie lub jeden rdzeń - pula procesów tylko by spowolniła
+        outcomes = []
+        for args in tasks:
+            try:
+                outcomes.append((fn(*args), None))
+            except Exception as e:
+                outcomes.append((None, str(e)))
+        return outcomes
+
+    pool = _get_pool(workers)
+    # Pomiary etapów z procesów potomnych wracają razem z wynikiem i są doliczane tutaj
+    futures = []
+    submit_error = None
+    for args in tasks:
+        try:
+            futures.append(pool.submit(run_measured, fn, *args))
+        except (BrokenProcessPool, RuntimeError) as e:
+            # Pula przerwana albo zamknięta przez inny wątek - nie przyjmie już żadnego zadania
+            submit_error = e
+            break
+    outcomes = []
+    broken = submit_error is not None
+    for future in futures:
+        try:
+            result, task_metrics = future.result()
+            stage_metrics.merge(task_metrics)
+            outcomes.append((result, None))
+        except BrokenProcessPool as e:
+            outcomes.append((None, f"proces parsujący przerwany ({e})"))
+            broken = True
+        except Exception as e:
+            outcomes.append((None, str(e)))
+    outcomes.extend([(None, f"proces parsujący przerwany ({submit_error})")] * (len(tasks) - len(futures)))
+    if broken:
+        # Martwa pula nie przyjmie kolejnych zadań - następne wywołanie utworzy nową
+        _reset_pool(pool)
+    return outcomes
+
+
+def load_all_games(file_paths, workers=INGEST_WORKERS):
+    """Wczytuje statystyki każdej gry plików z cache'u, a brakujące parsuje równolegle po jednej zakładce.
+
+    Plik bez zakładek gier, ale z zakładką 'suma', dostaje jedną "grę" SUMA_GAME z jej
+    statystykami. Zwraca listę {nazwa zakładki: statystyki graczy} w kolejności file_paths
+    (None dla plików bez żadnej z tych zakładek lub z błędem) oraz słownik błędów {ścieżka: komunikat}.
+    """
+    results, errors, pending = _cached_results(game_cache, file_paths)
+    if not pending:
+        return results, errors
+    stage_metrics.increment('files_parsed', len(pending))
+
+    tasks = [(i, game) for i in pending for game in GAME_SHEETS]
+    outcomes = _run_tasks(_parse_game, [(file_paths[i], game) for i, game in tasks], workers)
+    games = defaultdict(dict)
+    for (i, game), (player_stats, error) in zip(tasks, outcomes):
+        if error is not None:
+            errors.setdefault(file_paths[i], error)
+        elif player_stats is not None:
+            games[i][game] = player_stats
+
+    without_games = [i for i in pending if file_paths[i] not in errors and not games.get(i)]
+    if without_games:
+        # Starszy układ pliku - sama zakładka 'suma'; bez tego plik wypadłby z analizy bez śladu
+        outcomes = _run_tasks(_parse_file, [(file_paths[i],) for i in without_games], workers)
+        for i, (player_stats, error) in zip(without_games, outcomes):
+            if error is not None:
+                errors[file_paths[i]] = error
+            elif player_stats is not None:
+                logger.warning("Brak zakładek gier w %s - statystyki z zakładki 'suma'", file_paths[i])
+                games[i][SUMA_GAME] = player_stats
+            else:
+                logger.warning("Brak zakładek gier i zakładki 'suma' w %s - plik pominięty", file_paths[i])
+    for i, key in pending.items():
+        if file_paths[i] not in errors:
+            results[i] = game_cache.put(key, games.get(i) or None)
+    return results, errors
+
+
+def _check_mode(mode):
+    if mode not in INGEST_MODES:
+        raise ValueError(f"Nieznany tryb wczytywania: {mode}")
+
+
+def ingest_cache(mode=INGEST_MODE):
+    """Cache, w którym trafiają sparsowane pliki w danym trybie - jego indeks zna wersje plików"""
+    _check_mode(mode)
+    return game_cache if mode == 'games' else stats_cache
+
+
+def load_all_stats(file_paths, workers=INGEST_WORKERS, mode=INGEST_MODE):
+    """Wczytuje statystyki plików z cache'u, a brakujące parsuje równolegle w puli procesów.
+
+    W trybie 'games' statystyki sesji to suma gier z zakładek 'game N', w trybie
+    'suma' - zawartość zakładki 'suma'. Zwraca listę wyników w kolejności file_paths
+    (None dla plików bez potrzebnych zakładek lub z błędem) oraz słownik błędów
+    {ścieżka: komunikat}.
+    """
+    _check_mode(mode)
+    if mode == 'games':
+        games, errors = load_all_games(file_paths, workers)
+        return [sum_games(session) for session in games], errors
+
+    results, errors, pending = _cached_results(stats_cache, file_paths)
+    if not pending:
+        return results, errors
+    stage_metrics.increment('files_parsed', len(pending))
+
+    outcomes = _run_tasks(_parse_file, [(file_paths[i],) for i in pending], workers)
+    for (i, key), (player_stats, error) in zip(pending.items(), outcomes):
+        if error is not None:
+            errors[file_paths[i]] = error
+            continue
+        try:
+            results[i] = stats_cache.put(key, player_stats)
+        except Exception as e:
+            errors[file_paths[i]] = str(e)
+    return results, errors
+
+
+def sync_stats_db(file_paths, workers=INGEST_WORKERS, mode=INGEST_MODE):
+    """Wpisuje do bazy statystyk sesje, których brakuje albo których wersja lub tryb wczytywania się zmieniły.
+
+    Nieaktualne pliki są wczytywane przez cache (parsowane tylko przy jego braku). Zwraca
+    słownik błędów {ścieżka: komunikat}; sesje z błędem nie trafiają do bazy.
+    """
+    cache = ingest_cache(mode)
+    errors = {}
+    versions = {}
+    for path in file_paths:
+        try:
+            versions[path] = cache.version(path)
+        except OSError as e:
+            errors[path] = str(e)
+    stored = stats_db.versions(versions)
+    stale = [path for path, version in versions.items() if stored.get(os.path.abspath(path)) != (version, mode)]
+    if not stale and not errors:
+        return errors
+    # Przy zmianach w folderach usuwamy też sesje plików, których już nie ma (np. spoza obserwowanego folderu)
+    stats_db.prune()
+    if not stale:
+        return errors
+
+    if mode == 'games':
+        sessions, load_errors = load_all_games(stale, workers)
+    else:
+        results, load_errors = load_all_stats(stale, workers, mode)
+        sessions = [{SUMA_GAME: player_stats} if player_stats is not None else None for player_stats in results]
+    errors.update(load_errors)
+    stats_db.store([(path, versions[path], mode, games)
+                    for path, games in zip(stale, sessions) if path not in load_errors])
+    return errors
+
+
+def archived_sessions(file_paths):
+    """{ścieżka: (archiwum, indeks sesji)} dla ścieżek wskazujących sesje z archiwów sezonów"""
+    archived = {}
+    for path in file_paths:
+        session = find_session(path)
+        if session is not None:
+            archived[path] = session
+    return archived
+
+
+def session_version(path, mode=INGEST_MODE):
+    """Wersja sesji do kluczy cache'u: wersja archiwum albo hash zawartości pliku"""
+    session = find_session(path)
+    if session is not None:
+        return session[0].version
+    return ingest_cache(mode).version(path)
+
+
+def load_session_stats(file_paths, workers=INGEST_WORKERS, mode=INGEST_MODE):
+    """Statystyki sesji z folderu z bazy (po jej uzupełnieniu) w kolejności file_paths; zwraca też błędy"""
+    errors = sync_stats_db(file_paths, workers, mode)
+    with stage_metrics.span('db_query'):
+        results = stats_db.session_stats(file_paths)
+    return [None if path in errors else stats for path, stats in zip(file_paths, results)], errors
+
+
+def load_session_tensor(files, file_paths, workers=INGEST_WORKERS):
+    """Tensor wczytanych sesji files (w ich kolejności) i błędy wczytywania.
+
+    Sesje z folderu pochodzą z bazy, a sesje z archiwów sezonów - wprost z wierszy ich
+    mapowanych tablic, bez słowników statystyk; nie trafiają do bazy ani do cache'u.
+    """
+    archived = archived_sessions(file_paths)
+    live = [(file, path) for file, path in zip(files, file_paths) if path not in archived]
+    results, errors = load_session_stats([path for _, path in live], workers)
+    loaded = [(file, stats) for (file, _), stats in zip(live, results) if stats is not None]
+    parts = [StatsTensor.from_stats([file for file, _ in loaded], [stats for _, stats in loaded])]
+    by_archive = defaultdict(list)
+    for file, path in zip(files, file_paths):
+        if path in archived:
+            archive, i = archived[path]
+            by_archive[archive].append((i, file))
+    with stage_metrics.span('archive_read'):
+        parts.extend(archive.tensor([i for i, _ in sessions], [file for _, file in sessions])
+                     for archive, sessions in by_archive.items())
+    loaded_files = {file for part in parts for file in part.sessions}
+    return StatsTensor.concat(parts, [file for file in files if file in loaded_files]), errors
+
+
+def player_totals(file_paths):
+    """Zsumowane statystyki graczy z sesji file_paths - zapytanie agregujące bazy plus sumy z archiwów"""
+    archived = archived_sessions(file_paths)
+    totals = stats_db.player_totals([path for path in file_paths if path not in archived])
+    by_archive = defaultdict(list)
+    for archive, i in archived.values():
+        by_archive[archive].append(i)
+    for archive, indices in by_archive.items():
+        for player, stats in archive.player_totals(indices).items():
+            for action, value in stats.items():
+                totals[player][action] += value
+    return totals
+
+
+class LRUCache:
+    """Ograniczony słownik usuwający najdawniej używane wpisy"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def values(self):
+        with self._lock:
+            return list(self._entries.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SingleFlight:
+    """Łączy równoczesne wywołania z tym samym kluczem w jedno obliczenie.
+
+    Pierwsze wywołanie liczy wynik, a pozostałe czekają na nie i dostają ten sam
+    wynik (albo ten sam wyjątek).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn()
+        except BaseException as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+        return call['result']
+
+
+class PlayerFigures:
+    """Wykresy graczy budowane dopiero przy pierwszym odczycie i zapamiętywane.
+
+    Zachowuje się jak słownik {gracz: {kategoria: wykres}}, ale create_player_trend_plots
+    jest wywoływane tylko dla graczy, których zakładki ktoś otworzy.
+    """
+
+    def __init__(self, tensor, players):
+        self.tensor = tensor
+        self.players = list(players)
+        self._figures = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, player):
+        return player in self.players
+
+    def __iter__(self):
+        return iter(self.players)
+
+    def __len__(self):
+        return len(self.players)
+
+    def keys(self):
+        return list(self.players)
+
+    def __getitem__(self, player):
+        if player not in self.players:
+            raise KeyError(player)
+        with self._lock:
+            if player not in self._figures:
+                with stage_metrics.span('figure.player'):
+                    self._figures[player] = create_player_trend_plots(player, self.tensor)
+            return self._figures[player]
+
+    def get(self, player, default=None):
+        return self[player] if player in self.players else default
+
+
+# Wyniki analizy kluczowane znormalizowanym wyborem plików i ich wersjami
+figure_cache = LRUCache(FIGURE_CACHE_SIZE)
+
+
+class AnalysisState:
+    """Stan analizy jednego wyboru plików: tensor sesji aktualizowany przez dodawanie i odejmowanie sesji.
+
+    versions obejmuje wszystkie rozpatrzone pliki (także te bez statystyk); sumy graczy
+    dla tabeli podsumowania pochodzą z zapytania agregującego bazy.
+    """
+
+    def __init__(self, versions, tensor):
+        self.versions = versions
+        self.tensor = tensor
+
+    def delta(self, versions):
+        """Pliki do usunięcia i dodania, by przejść od tego stanu do wyboru o podanych wersjach"""
+        removed = [file for file, version in self.versions.items() if versions.get(file) != version]
+        added = [file for file, version in versions.items() if self.versions.get(file) != version]
+        return removed, added
+
+    def apply(self, versions, removed, added):
+        """Nowy stan po usunięciu sesji removed i dodaniu sesji z tensora added"""
+        removed = set(removed)
+        kept = self.tensor.select([file for file in self.tensor.sessions if file not in removed])
+        # Sesje w tensorze są w kolejności chronologicznej, nie alfabetycznej
+        sessions = sorted(kept.sessions + added.sessions, key=session_sort_key)
+        return AnalysisState(versions, StatsTensor.concat([kept, added], sessions))
+
+
+# Ostatnie stany analizy - nowy wybór jest liczony od najbliższego z nich
+analysis_states = LRUCache(ANALYSIS_STATE_SIZE)
+# Trwające analizy - identyczne żądania z różnych sesji czekają na jeden wynik
+analysis_flights = SingleFlight()
+
+
+def selection_key(file_paths, versions):
+    """Klucz wyboru: posortowane pary (ścieżka, wersja) - zmiana zawartości pliku daje nowy klucz"""
+    return tuple(sorted(set(zip((os.path.abspath(path) for path in file_paths), versions))))
+
+
+def _build_state(selected_files, file_paths, versions, workers):
+    """Buduje stan analizy - przyrostowo od najbliższego zapamiętanego stanu albo od zera"""
+    base = None
+    best = len(selected_files)
+    if versions is not None:
+        for state in analysis_states.values():
+            removed, added = state.delta(versions)
+            if len(removed) + len(added) < best:
+                base, best = state, len(removed) + len(added)
+
+    if base is None:
+        with stage_metrics.span('load'):
+            tensor, errors = load_session_tensor(selected_files, file_paths, workers)
+        state = AnalysisState(versions, tensor)
+    else:
+        # Parsujemy tylko nowe pliki, a ich wkład dodajemy do gotowych sum
+        stage_metrics.increment('analysis_state.incremental')
+        removed, added = base.delta(versions)
+        paths = dict(zip(selected_files, file_paths))
+        with stage_metrics.span('load'):
+            added_tensor, errors = load_session_tensor(added, [paths[file] for file in added], workers)
+        with stage_metrics.span('merge'):
+            state = base.apply(versions, removed, added_tensor)
+
+    if versions is not None and not errors:
+        analysis_states.put(tuple(sorted(versions.items())), state)
+    return state, errors
+
+
+def game_tensor(files, file_paths, workers=INGEST_WORKERS):
+    """Tensor z jedną pozycją na każdą grę plików files (w kolejności plików, a w pliku - gier)"""
+    archived = archived_sessions(file_paths)
+    live = [path for path in file_paths if path not in archived]
+    errors = sync_stats_db(live, workers)
+    with stage_metrics.span('db_query'):
+        live_games = dict(zip(live, stats_db.game_stats(live)))
+    # Etykieta '<plik> <gra>' - wykresy obcinają rozszerzenie tak jak przy sesjach
+    labels = []
+    live_labels = []
+    live_stats = []
+    parts = []
+    for file, path in zip(files, file_paths):
+        if path in archived:
+            with stage_metrics.span('archive_read'):
+                games = archived[path][0].game_tensor(archived[path][1])
+            games = StatsTensor([f"{file} {game}" for game in games.sessions], games.players, games.values,
+                                games.session_players)
+            labels.extend(games.sessions)
+            parts.append(games)
+            continue
+        for game, player_stats in (live_games[path] or {}).items():
+            labels.append(f"{file} {game}")
+            live_labels.append(labels[-1])
+            live_stats.append(player_stats)
+    parts.append(StatsTensor.from_stats(live_labels, live_stats))
+    return StatsTensor.concat(parts, labels), errors
+
+
+def analyze_stats(selected_files, workers=INGEST_WORKERS, granularity='session', excel_folder="excel",
+                  archive_folder=ARCHIVE_FOLDER, prefix_index=None):
+    """Analiza wybranych sesji: plików z excel_folder oraz sesji '<sezon>/<plik>' z archiwów w archive_folder.
+
+    prefix_index (PrefixIndex sesji z excel_folder) pozwala wziąć tabelę podsumowania
+    dla ciągłego zakresu sesji z sum narastających zamiast z zapytania agregującego bazy.
+    """
+    if any(not is_archived(file) for file in selected_files or []) and not os.path.exists(excel_folder):
+        return f"Błąd: Folder '{excel_folder}' nie istnieje!", None, None, None, None, None, None, {}
+
     if selected_files is None or len(selected_files) == 0:
         return "Błąd: Nie wybrano żadnych plików!", None, None, None, None, None, None, {}
-    
-    # Sortuj pliki po dacie
-    selected_files.sort()
-    
-    all_stats = []
-    for file in selected_files:
-        file_path = os.path.join(excel_folder, file)
-        workbook = openpyxl.load_workbook(file_path, data_only=True)
-        
-        if "suma" in workbook.sheetnames:
-            sheet = workbook["suma"]
-            player_stats = process_stats(sheet)
-            all_stats.append(player_stats)
-    
-    merged_stats = merge_stats(all_stats)
-    df = create_player_summary_df(merged_stats)
-    fig_receive, fig_sets, fig_scored, fig_lost = create_plots(df)
-    fig_trend = create_trend_plot(selected_files, all_stats)
-    
-    # Przygotuj wykresy dla każdego gracza
-    player_figs = {}
-    players = sorted(set(df['Gracz']))
-    for player in players:
-        player_figs[player] = create_player_trend_plots(player, selected_files, all_stats)
-    
-    summary = f"Przeanalizowano {len(selected_files)} plików:\n"
-    summary += ", ".join(selected_files)
-    
-    return summary, fig_receive, fig_sets, fig_scored, fig_lost, df, fig_trend, player_figs
+
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Nieznana rozdzielczość trendów: {granularity}")
+
+    # Sortuj pliki po dacie z nazwy (alfabetycznie 31.01 wypadłoby po 10.02)
+    selected_files.sort(key=session_sort_key)
+
+    file_paths = [os.path.join(archive_folder if is_archived(file) else excel_folder, file) for file in selected_files]
+    try:
+        versions = {file: session_version(path) for file, path in zip(selected_files, file_paths)}
+        key = (granularity, selection_key(file_paths, [versions[file] for file in selected_files]))
+    except OSError:
+        # Brakujący plik - błąd zostanie zgłoszony przy wczytywaniu
+        versions = key = None
+    cached = figure_cache.get(key) if key is not None else None
+    if cached is not None:
+        stage_metrics.increment('figure_cache.hit')
+        return cached
+
+    range_totals = None
+    span = prefix_index.span(selected_files) if prefix_index is not None and versions is not None else None
+    if span is not None and all(prefix_index.versions.get(file) == versions[file] for file in selected_files):
+        # Indeks jest aktualny dla całego wyboru - sumy zakresu to dwa odczyty i odejmowanie
+        range_totals = prefix_index.merged(*span)
+
+    def run():
+        # Wynik mógł trafić do cache'u, zanim to wywołanie zostało liderem
+        cached = figure_cache.get(key) if key is not None else None
+        if cached is not None:
+            stage_metrics.increment('figure_cache.hit')
+            return cached
+        stage_metrics.increment('figure_cache.miss')
+        with profiled("analyze"), stage_metrics.span('analyze'):
+            result = _analyze(selected_files, file_paths, versions, key, workers, granularity, range_totals)
+        write_metrics_file()
+        return result
+
+    if key is None:
+        return run()
+    return analysis_flights.do(key, run)
+
+
+def _analyze(selected_files, file_paths, versions, key, workers, granularity, range_totals=None):
+    state, errors = _build_state(selected_files, file_paths, versions, workers)
+    # W tensorze są tylko wczytane pliki, więc daty na wykresach trendów zgadzają się ze statystykami
+    tensor = state.tensor
+    loaded_files = tensor.sessions
+    paths = dict(zip(selected_files, file_paths))
+
+    if granularity == 'game' and loaded_files:
+        # Gry wczytanych plików są już w bazie - zostały do niej wpisane wyżej
+        loaded_paths = [paths[file] for file in loaded_files]
+        trend_tensor, game_errors = game_tensor(loaded_files, loaded_paths, workers)
+        errors = {**errors, **{path: error for path, error in game_errors.items() if path not in errors}}
+    else:
+        trend_tensor = tensor
+
+    errors_summary = ""
+    if errors:
+        errors_summary = "\nNie udało się wczytać:\n"
+        errors_summary += "\n".join(f"{os.path.basename(path)}: {error}" for path, error in errors.items())
+    if not loaded_files:
+        return "Błąd: Nie wczytano żadnego pliku!" + errors_summary, None, None, None, None, None, None, {}
+
+    with stage_metrics.span('dataframe'):
+        # Tabela z sum zakresu indeksu albo z zapytania agregującego bazy; gracze w kolejności
+        # tensora (pierwsze wystąpienie w wyborze)
+        if range_totals is not None and len(loaded_files) == len(selected_files):
+            stage_metrics.increment('prefix_index.totals')
+            totals = range_totals
+        else:
+            totals = player_totals([paths[file] for file in loaded_files])
+        df = create_player_summary_df({player: totals[player] for player in tensor.players if player in totals})
+    with stage_metrics.span('figure.team'):
+        fig_receive, fig_sets, fig_scored, fig_lost = create_plots(df)
+    with stage_metrics.span('figure.trend'):
+        fig_trend = create_trend_plot(trend_tensor)
+
+    # Wykresy graczy powstaną dopiero przy otwarciu ich zakładek
+    player_figs = PlayerFigures(trend_tensor, sorted(set(df['Gracz'])))
+
+    summary = f"Przeanalizowano {len(loaded_files)} plików:\n"
+    summary += ", ".join(loaded_files)
+    summary += errors_summary
+
+    result = (summary, fig_receive, fig_sets, fig_scored, fig_lost, df, fig_trend, player_figs)
+    if key is not None and not errors:
+        figure_cache.put(key, result)
+    return result
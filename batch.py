@@ -0,0 +1,167 @@
+# batch.py
+# Analiza plików bez interfejsu - do zadań uruchamianych z crona, np.:
+#   python batch.py excel --from 01.02.2025 --to 28.02.2025 --output wyniki --figures
+# Nie importuje gradio, więc startuje szybko i działa na maszynach bez przeglądarki.
+import argparse
+import glob
+import os
+import sys
+import pandas as pd
+from analysis import GRANULARITIES, INGEST_WORKERS, analyze_stats
+from instrumentation import configure_logging, write_metrics_file
+from season_archive import ARCHIVE_FOLDER, list_sessions
+from session_catalog import parse_session_date, session_sort_key
+from stats_processing import ACTIONS
+
+OUTPUT_FORMATS = ('csv', 'parquet')
+
+
+def _date_argument(text):
+    date = parse_session_date(text)
+    if date is None:
+        raise argparse.ArgumentTypeError(f"niepoprawna data '{text}' (oczekiwano DD.MM.RRRR)")
+    return date
+
+
+def find_files(source):
+    """Folder z plikami albo wzorzec glob; zwraca (folder, nazwy plików .xlsx)"""
+    if os.path.isdir(source):
+        folder = source
+        files = [f for f in os.listdir(folder) if f.endswith(".xlsx")]
+    else:
+        paths = [path for path in glob.glob(source) if path.endswith(".xlsx") and os.path.isfile(path)]
+        folders = {os.path.dirname(path) for path in paths}
+        if len(folders) > 1:
+            # Nazwy plików są nazwami sesji - muszą być jednoznaczne w obrębie jednego folderu
+            raise ValueError(f"Wzorzec '{source}' obejmuje pliki z kilku folderów: {', '.join(sorted(folders))}")
+        folder = folders.pop() if folders else os.path.dirname(source) or "."
+        files = [os.path.basename(path) for path in paths]
+    return folder, sorted(files, key=session_sort_key)
+
+
+def filter_by_date(files, date_from=None, date_to=None):
+    """Pliki z datą w nazwie mieszczącą się w przedziale [date_from, date_to]; zwraca (wybrane, pominięte)"""
+    if date_from is None and date_to is None:
+        return list(files), []
+    selected = []
+    skipped = []
+    for file in files:
+        date = parse_session_date(file)
+        if date is None:
+            skipped.append(file)
+        elif (date_from is None or date >= date_from) and (date_to is None or date <= date_to):
+            selected.append(file)
+    return selected, skipped
+
+
+def session_stats_df(tensor):
+    """Statystyki każdego gracza w każdej sesji (lub grze) - tylko pary, w których gracz wystąpił"""
+    rows = []
+    for s, session in enumerate(tensor.sessions):
+        for player in tensor.session_players[s]:
+            values = tensor.values[s, tensor.player_index[player]].tolist()
+            rows.append([session, player] + values)
+    return pd.DataFrame(rows, columns=['Sesja', 'Gracz'] + list(ACTIONS))
+
+
+def write_table(df, output_dir, name, formats):
+    paths = []
+    for output_format in formats:
+        path = os.path.join(output_dir, f"{name}.{output_format}")
+        if output_format == 'csv':
+            df.to_csv(path, index=False)
+        else:
+            # Wymaga pyarrow lub fastparquet
+            df.to_parquet(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def write_figures(figures, output_dir):
+    """Zapisuje wykresy jako samodzielne pliki HTML (plotly.js dołączany z CDN)"""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for name, fig in figures.items():
+        if fig is None:
+            continue
+        path = os.path.join(output_dir, f"{name}.html")
+        fig.write_html(path, include_plotlyjs='cdn')
+        paths.append(path)
+    return paths
+
+
+def run(source, date_from=None, date_to=None, output_dir="batch_output", formats=OUTPUT_FORMATS,
+        figures=False, granularity='session', workers=INGEST_WORKERS, seasons=(), archive_folder=ARCHIVE_FOLDER):
+    """Analizuje pliki (oraz sesje z archiwów sezonów seasons) i zapisuje wyniki; zwraca listę zapisanych plików"""
+    folder, files = find_files(source)
+    if seasons:
+        files = sorted(files + list_sessions(archive_folder, seasons), key=session_sort_key)
+    files, skipped = filter_by_date(files, date_from, date_to)
+    for file in skipped:
+        print(f"Pominięto {file}: brak daty w nazwie pliku")
+    if not files:
+        raise ValueError(f"Brak plików do analizy w '{source}' dla podanego zakresu dat")
+
+    summary, fig_receive, fig_sets, fig_scored, fig_lost, df, fig_trend, player_figs = analyze_stats(
+        files, workers=workers, granularity=granularity, excel_folder=folder, archive_folder=archive_folder)
+    print(summary)
+    if df is None:
+        raise ValueError("Analiza nie zwróciła wyników")
+
+    os.makedirs(output_dir, exist_ok=True)
+    written = write_table(df, output_dir, "player_summary", formats)
+    written += write_table(session_stats_df(player_figs.tensor), output_dir, "session_stats", formats)
+
+    if figures:
+        figures_dir = os.path.join(output_dir, "figures")
+        written += write_figures({
+            'receive': fig_receive,
+            'sets': fig_sets,
+            'scored': fig_scored,
+            'lost': fig_lost,
+            'trend': fig_trend
+        }, figures_dir)
+        for player in player_figs:
+            written += write_figures({f"{player}_{category}": fig for category, fig in player_figs[player].items()},
+                                     os.path.join(figures_dir, "players"))
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analiza statystyk siatkówki bez interfejsu Gradio")
+    parser.add_argument("source", nargs="?", default="excel",
+                        help="folder z plikami .xlsx albo wzorzec glob (domyślnie: excel)")
+    parser.add_argument("--from", dest="date_from", type=_date_argument, help="pierwsza data (DD.MM.RRRR)")
+    parser.add_argument("--to", dest="date_to", type=_date_argument, help="ostatnia data (DD.MM.RRRR)")
+    parser.add_argument("--output", default="batch_output", help="folder wyników (domyślnie: batch_output)")
+    parser.add_argument("--format", dest="formats", nargs="+", choices=OUTPUT_FORMATS, default=list(OUTPUT_FORMATS),
+                        help="formaty tabel (domyślnie: csv parquet)")
+    parser.add_argument("--figures", action="store_true", help="zapisz też wykresy jako pliki HTML")
+    parser.add_argument("--granularity", choices=GRANULARITIES, default='session',
+                        help="wiersze tabeli sesji i punkty trendów: sesje albo gry")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS,
+                        help="liczba procesów parsujących (domyślnie: liczba rdzeni)")
+    parser.add_argument("--season", dest="seasons", nargs="+", default=[],
+                        help="dołącz sesje z archiwów tych sezonów (zob. season_archive.py)")
+    parser.add_argument("--archive-dir", default=ARCHIVE_FOLDER,
+                        help=f"folder archiwów sezonów (domyślnie: {ARCHIVE_FOLDER})")
+    parser.add_argument("--log-level", help="poziom logowania, np. DEBUG (domyślnie: bez logów)")
+    parser.add_argument("--metrics", help="plik JSON z czasami etapów i licznikami cache'u")
+    args = parser.parse_args(argv)
+    configure_logging(args.log_level)
+
+    try:
+        written = run(args.source, args.date_from, args.date_to, args.output, args.formats,
+                      args.figures, args.granularity, args.workers, args.seasons, args.archive_dir)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"Błąd: {e}", file=sys.stderr)
+        return 1
+    print(f"Zapisano {len(written)} plików w '{args.output}'")
+    metrics_path = write_metrics_file(args.metrics)
+    if metrics_path:
+        print(f"Metryki zapisano w {metrics_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
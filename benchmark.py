@@ -0,0 +1,330 @@
+# benchmark.py
+# Pomiary czasu i pamięci kolejnych etapów analizy na syntetycznych plikach, np.:
+#   python benchmark.py --sessions 40 --players 12 --games 3 --output bench.json
+# Wyniki trafiają do pliku JSON, żeby dało się porównywać przebiegi w czasie.
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+import openpyxl
+from game_stats import GAME_SHEETS, RALLY_ROW, count_rallies, process_game_sheet, sum_games
+from stats_processing import STAT_MAPPINGS, process_stats, merge_stats, create_player_summary_df
+from workbook_loader import load_sheet, load_suma_sheet
+
+BENCHMARK_FORMAT = 1
+
+# Kolejność kodów w tabelach zakładek gier: (nagłówek, kody) dla lewej i prawej kolumny tabel
+LEFT_TABLES = [('receives', ['!1', '!2', '!3', '!4']),
+               ('serves', ['@1', '@2', '@3']),
+               ('errors', ['#1', '#2', '#3', '#4'])]
+RIGHT_TABLES = [('sets', ['$1', '$2', '$3', '$4']),
+                ('defence', ['%1', '%2']),
+                ('attack', ['^1', '^2', '^3'])]
+# Wiersze nagłówków tabel (jak w prawdziwych plikach) i tabeli punktów
+TABLE_ROWS = (7, 15, 21)
+POINTS_ROW = 29
+# Wiersze zakładki 'suma': gracze w wierszu 3, kody od wiersza 4, sumy punktów w 24-25
+SUMA_CODES = ['!1', '!2', '!3', '!4', '@1', '@2', '@3', '#1', '#2', '#3', '#4',
+              '$1', '$2', '$3', '$4', '%1', '%2', '^1', '^2', '^3']
+SCORED_CODES = ('@1', '%2', '^1')
+LOST_CODES = ('!4', '@2', '@3', '#4', '^2', '^3')
+
+
+def player_names(count):
+    """Nazwy graczy o różnych pierwszych literach - zapis wymian rozpoznaje gracza po pierwszej literze"""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return [f"{letters[i % 26]}gracz{i}" for i in range(count)]
+
+
+def random_rallies(players, count, rng):
+    """Zapis wymian w stylu wiersza 37, np. 'm!1g$4g#4' albo 'ef' (błąd przeciwnika)"""
+    codes = list(STAT_MAPPINGS)
+    rallies = []
+    for _ in range(count):
+        if rng.random() < 0.1:
+            rallies.append('ef')
+            continue
+        actions = rng.randint(1, 4)
+        rallies.append(''.join(rng.choice(players)[0] + rng.choice(codes) for _ in range(actions)))
+    return rallies
+
+
+def _countif(column_letter, header_row, code_cell):
+    return f'=COUNTIF($37:$37, "*"&LEFT({column_letter}${header_row}, 1)&{code_cell}&"*")'
+
+
+def write_game_sheet(sheet, players, rallies, formulas):
+    """Zakładka 'game N' w układzie prawdziwych plików; liczniki jako wartości albo formuły COUNTIF"""
+    counts = {(player, code): count_rallies(rallies, player, code) for player in players for code in STAT_MAPPINGS}
+    cells = {}
+    # Prawa kolumna tabel zaczyna się kolumnę za ostatnim graczem lewej (dla 8 graczy - kolumna L)
+    right = len(players) + 4
+    for header_row, left, right_table in zip(TABLE_ROWS, LEFT_TABLES, RIGHT_TABLES):
+        for code_column, (title, codes) in ((1, left), (right, right_table)):
+            sheet.cell(header_row, code_column, 'lp.')
+            sheet.cell(header_row, code_column + 1, title)
+            for i, player in enumerate(players):
+                sheet.cell(header_row, code_column + 2 + i, player)
+            for offset, code in enumerate(codes, 1):
+                row = header_row + offset
+                sheet.cell(row, code_column, code)
+                sheet.cell(row, code_column + 1, STAT_MAPPINGS[code])
+                for i, player in enumerate(players):
+                    column = code_column + 2 + i
+                    if formulas:
+                        letter = openpyxl.utils.get_column_letter(column)
+                        code_cell = f"${openpyxl.utils.get_column_letter(code_column)}{row}"
+                        value = _countif(letter, header_row, code_cell)
+                    else:
+                        value = counts[player, code]
+                    sheet.cell(row, column, value)
+                    cells[player, code] = f"{openpyxl.utils.get_column_letter(column)}${row}"
+
+    sheet.cell(POINTS_ROW, right + 1, 'points')
+    for i, player in enumerate(players):
+        sheet.cell(POINTS_ROW, right + 2 + i, player)
+        for row, codes in ((POINTS_ROW + 1, SCORED_CODES), (POINTS_ROW + 2, LOST_CODES)):
+            if formulas:
+                value = f"=SUM({','.join(cells[player, code] for code in codes)})"
+            else:
+                value = sum(counts[player, code] for code in codes)
+            sheet.cell(row, right + 2 + i, value)
+    sheet.cell(POINTS_ROW + 1, right + 1, 'scored')
+    sheet.cell(POINTS_ROW + 2, right + 1, 'lost')
+
+    for i, rally in enumerate(rallies):
+        sheet.cell(RALLY_ROW, 2 + i, rally)
+    return counts, cells
+
+
+def write_suma_sheet(sheet, players, games, formulas):
+    """Zakładka 'suma' z sumami gier - wartościami albo formułami SUM po zakładkach gier"""
+    sheet.cell(3, 1, 'recieves')
+    sheet.cell(3, 2, 'lp.')
+    for i, player in enumerate(players):
+        sheet.cell(3, 4 + i, player)
+    for row, code in enumerate(SUMA_CODES, 4):
+        sheet.cell(row, 2, code)
+        sheet.cell(row, 3, STAT_MAPPINGS[code])
+        for i, player in enumerate(players):
+            sheet.cell(row, 4 + i, _suma_value(games, player, [code], formulas))
+    for row, label, codes in ((24, 'scored', SCORED_CODES), (25, 'lost', LOST_CODES)):
+        sheet.cell(row, 1, label)
+        for i, player in enumerate(players):
+            sheet.cell(row, 4 + i, _suma_value(games, player, codes, formulas))
+
+
+def _suma_value(games, player, codes, formulas):
+    if formulas:
+        refs = [f"'{name}'!{cells[player, code]}" for name, (_, cells) in games.items() for code in codes]
+        return f"=SUM({','.join(refs)})"
+    return sum(counts[player, code] for counts, _ in games.values() for code in codes)
+
+
+def generate_workbook(path, players, games=3, rallies=40, formulas=False, seed=0):
+    """Syntetyczny plik sesji: zakładki 'game 1'..'game N' i 'suma'.
+
+    Przy formulas=True liczniki są formułami bez zapisanych wartości (jak po zapisie
+    programem, który ich nie przelicza) - tryb 'suma' nie widzi wtedy danych, a tryb
+    'games' liczy je z zapisu wymian.
+    """
+    rng = random.Random(seed)
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    written = {}
+    for game in range(1, games + 1):
+        name = f"game {game}"
+        sheet = workbook.create_sheet(name)
+        written[name] = write_game_sheet(sheet, players, random_rallies(players, rallies, rng), formulas)
+    write_suma_sheet(workbook.create_sheet("suma"), players, written, formulas)
+    workbook.save(path)
+
+
+def generate_dataset(folder, sessions, players, games=3, rallies=40, formulas=False, seed=0):
+    """Folder z plikami kolejnych sesji nazwanymi datami (DD.MM.RRRR.xlsx); zwraca nazwy plików"""
+    os.makedirs(folder, exist_ok=True)
+    names = player_names(players)
+    first = date(2025, 1, 1)
+    files = []
+    for i in range(sessions):
+        file = f"{(first + timedelta(days=i)).strftime('%d.%m.%Y')}.xlsx"
+        # Co któraś sesja bez jednego gracza - jak nieobecności na treningach
+        present = [name for j, name in enumerate(names) if (i + j) % 7 != 0] if players > 2 else names
+        generate_workbook(os.path.join(folder, file), present, games, rallies, formulas, seed + i)
+        files.append(file)
+    return files
+
+
+def measure(fn, repeat=1):
+    """Czas (min i mediana z repeat przebiegów) oraz szczyt pamięci Pythona w pierwszym przebiegu"""
+    times = []
+    peak = 0
+    result = None
+    for i in range(repeat):
+        if i == 0:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+        if i == 0:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return {
+        'seconds_min': min(times),
+        'seconds_median': statistics.median(times),
+        'repeat': repeat,
+        'peak_python_kb': round(peak / 1024, 1)
+    }, result
+
+
+def _max_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Linux podaje ru_maxrss w kilobajtach, macOS w bajtach
+    scale = 1024 if sys.platform == 'darwin' else 1
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(folder, files, repeat=3, workers=None, formulas=False):
+    """Mierzy etapy analizy na plikach z folderu; zwraca {etap: pomiary}.
+
+    Przy formulas=True zakładki 'suma' nie mają zapisanych wartości, więc etapy od
+    merge_stats dalej dostają sumy gier - tak jak analiza w trybie wczytywania 'games'.
+    """
+    import analysis
+    import figure_builder
+    from figure_builder import same_json
+    from stats_cache import GAME_PARSER_VERSION, StatsCache, pack_games, unpack_games
+    from stats_db import StatsDB
+    from stats_tensor import StatsTensor
+    from plots import create_plots, create_trend_plot, create_player_trend_plots
+
+    paths = [os.path.join(folder, file) for file in files]
+    stages = {}
+
+    stages['load_suma_sheets'], sheets = measure(lambda: [load_suma_sheet(path) for path in paths], repeat)
+    stages['process_stats'], all_stats = measure(lambda: [process_stats(sheet) for sheet in sheets], repeat)
+    stages['load_game_sheets'], game_sheets = measure(
+        lambda: [[(game, load_sheet(path, game, RALLY_ROW)) for game in GAME_SHEETS] for path in paths], repeat)
+    game_sheets = [[(game, sheet) for game, sheet in sheets if sheet is not None] for sheets in game_sheets]
+    stages['process_game_sheets'], all_games = measure(
+        lambda: [{game: process_game_sheet(sheet) for game, sheet in sheets} for sheets in game_sheets], repeat)
+    if formulas:
+        all_stats = [sum_games(games) or {} for games in all_games]
+    stages['merge_stats'], merged = measure(lambda: merge_stats(all_stats), repeat)
+    stages['create_player_summary_df'], df = measure(lambda: create_player_summary_df(merged), repeat)
+    stages['create_plots'], _ = measure(lambda: create_plots(df), repeat)
+    tensor = StatsTensor.from_stats(files, all_stats)
+    stages['create_trend_plot'], _ = measure(lambda: create_trend_plot(tensor), repeat)
+    stages['create_player_trend_plots'], fast = measure(
+        lambda: [create_player_trend_plots(player, tensor) for player in tensor.players], repeat)
+    # Te same wykresy całego składu z walidacją plotly przy każdym wykresie - punkt odniesienia dla wzorców
+    figure_builder.VALIDATE_FIGURES = True
+    try:
+        stages['create_player_trend_plots_validated'], validated = measure(
+            lambda: [create_player_trend_plots(player, tensor) for player in tensor.players], repeat)
+    finally:
+        figure_builder.VALIDATE_FIGURES = False
+    stages['create_player_trend_plots']['same_json_as_validated'] = all(
+        same_json(figures[category], reference[category])
+        for figures, reference in zip(fast, validated) for category in figures)
+
+    # Całość: na zimno (pusty cache na dysku i w pamięci) i na ciepło (wynik z cache'u wykresów)
+    cache_dir = tempfile.mkdtemp(prefix="bench_cache_")
+    saved = analysis.stats_cache, analysis.game_cache, analysis.stats_db
+    try:
+        def cold():
+            analysis.stats_cache = StatsCache(cache_dir)
+            analysis.game_cache = StatsCache(os.path.join(cache_dir, "games"), pack=pack_games, unpack=unpack_games,
+                                             parser_version=GAME_PARSER_VERSION)
+            analysis.stats_db = StatsDB(os.path.join(cache_dir, "stats.db"))
+            analysis.stats_cache.clear()
+            analysis.game_cache.clear()
+            analysis.stats_db.clear()
+            analysis.figure_cache.clear()
+            analysis.analysis_states.clear()
+            return analysis.analyze_stats(list(files), workers=workers, excel_folder=folder)
+
+        stages['analyze_stats_cold'], _ = measure(cold, repeat)
+        stages['analyze_stats_warm'], _ = measure(
+            lambda: analysis.analyze_stats(list(files), workers=workers, excel_folder=folder), repeat)
+    finally:
+        analysis.stats_cache, analysis.game_cache, analysis.stats_db = saved
+        analysis.figure_cache.clear()
+        analysis.analysis_states.clear()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return stages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark etapów analizy na syntetycznych plikach")
+    parser.add_argument("--sessions", type=int, default=20, help="liczba plików sesji")
+    parser.add_argument("--players", type=int, default=8, help="liczba graczy")
+    parser.add_argument("--games", type=int, default=3, help="liczba zakładek gier w pliku (analiza czyta game 1-3)")
+    parser.add_argument("--rallies", type=int, default=40, help="liczba wymian w grze")
+    parser.add_argument("--formulas", action="store_true",
+                        help="liczniki gier jako formuły bez zapisanych wartości")
+    parser.add_argument("--repeat", type=int, default=3, help="liczba powtórzeń każdego etapu")
+    parser.add_argument("--workers", type=int, default=None, help="liczba procesów parsujących")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data", help="folder na wygenerowane pliki (domyślnie tymczasowy, usuwany po pomiarze)")
+    parser.add_argument("--output", default="benchmark_results.json", help="plik JSON z wynikami")
+    args = parser.parse_args(argv)
+
+    folder = args.data or tempfile.mkdtemp(prefix="bench_excel_")
+    try:
+        start = time.perf_counter()
+        files = generate_dataset(folder, args.sessions, args.players, args.games, args.rallies,
+                                 args.formulas, args.seed)
+        generation = time.perf_counter() - start
+        stages = run_benchmark(folder, files, args.repeat, args.workers, args.formulas)
+    finally:
+        if not args.data:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    results = {
+        'format': BENCHMARK_FORMAT,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {key: getattr(args, key) for key in
+                   ('sessions', 'players', 'games', 'rallies', 'formulas', 'repeat', 'workers', 'seed')},
+        'generation_seconds': generation,
+        'stages': stages,
+        'max_rss_kb': _max_rss_kb()
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    for stage, result in stages.items():
+        print(f"{stage:36} {result['seconds_median'] * 1000:10.1f} ms  {result['peak_python_kb']:10.1f} KB")
+    print(f"Wyniki zapisano w {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# check_incremental.py
+# Sprawdzenie, że stan analizy liczony przyrostowo (od zapamiętanego stanu) jest taki sam
+# jak zbudowany od zera - losowe wybory sesji na syntetycznych plikach, np.:
+#   python check_incremental.py --sessions 12 --rounds 50
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import numpy as np
+from benchmark import generate_dataset, generate_workbook, player_names
+
+
+def same_tensor(a, b):
+    """Te same sesje, gracze (w tej samej kolejności), obecności, typ i wartości"""
+    return (a.sessions == b.sessions and a.players == b.players and a.session_players == b.session_players
+            and a.values.dtype == b.values.dtype and np.array_equal(a.values, b.values))
+
+
+def run_check(folder, files, rounds, seed=0, players=8):
+    """Porównuje _build_state z zapamiętanymi stanami i bez nich; zwraca listę niezgodnych wyborów"""
+    import analysis
+    from session_catalog import session_sort_key
+
+    rng = random.Random(seed)
+    names = player_names(players)
+    mismatches = []
+    for round_number in range(rounds):
+        if round_number and round_number % 10 == 0:
+            # Zmiana zawartości pliku - stan z poprzednią wersją musi ją usunąć i wczytać od nowa
+            file = rng.choice(files)
+            generate_workbook(os.path.join(folder, file), rng.sample(names, rng.randint(2, len(names))),
+                              seed=rng.randrange(1 << 30))
+        selected = sorted(rng.sample(files, rng.randint(1, len(files))), key=session_sort_key)
+        paths = [os.path.join(folder, file) for file in selected]
+        versions = {file: analysis.session_version(path) for file, path in zip(selected, paths)}
+
+        incremental, errors = analysis._build_state(selected, paths, versions, 1)
+        saved = analysis.analysis_states
+        analysis.analysis_states = analysis.LRUCache(analysis.ANALYSIS_STATE_SIZE)
+        try:
+            scratch, scratch_errors = analysis._build_state(selected, paths, versions, 1)
+        finally:
+            analysis.analysis_states = saved
+        if errors or scratch_errors or not same_tensor(incremental.tensor, scratch.tensor):
+            mismatches.append(selected)
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Porównanie analizy przyrostowej z analizą od zera")
+    parser.add_argument("--sessions", type=int, default=12, help="liczba plików sesji")
+    parser.add_argument("--players", type=int, default=8, help="liczba graczy")
+    parser.add_argument("--rounds", type=int, default=50, help="liczba losowych wyborów")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    import analysis
+    from instrumentation import stage_metrics
+    from stats_cache import GAME_PARSER_VERSION, StatsCache, pack_games, unpack_games
+    from stats_db import StatsDB
+
+    # Osobne pliki, cache i baza - sprawdzenie nie dotyka danych aplikacji
+    folder = tempfile.mkdtemp(prefix="check_excel_")
+    cache_dir = tempfile.mkdtemp(prefix="check_cache_")
+    saved = analysis.stats_cache, analysis.game_cache, analysis.stats_db
+    try:
+        analysis.stats_cache = StatsCache(cache_dir)
+        analysis.game_cache = StatsCache(os.path.join(cache_dir, "games"), pack=pack_games, unpack=unpack_games,
+                                         parser_version=GAME_PARSER_VERSION)
+        analysis.stats_db = StatsDB(os.path.join(cache_dir, "stats.db"))
+        files = generate_dataset(folder, args.sessions, args.players, seed=args.seed)
+        mismatches = run_check(folder, files, args.rounds, args.seed, args.players)
+    finally:
+        analysis.stats_cache, analysis.game_cache, analysis.stats_db = saved
+        analysis.analysis_states.clear()
+        shutil.rmtree(folder, ignore_errors=True)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    for selected in mismatches:
+        print("Niezgodny wynik dla wyboru: " + ", ".join(selected))
+    if mismatches:
+        return 1
+    incremental = stage_metrics.snapshot()['counters'].get('analysis_state.incremental', 0)
+    print(f"Analiza przyrostowa zgodna z analizą od zera w {args.rounds} losowych wyborach "
+          f"({incremental} liczonych przyrostowo)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
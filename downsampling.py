@@ -0,0 +1,36 @@
+# downsampling.py
+import numpy as np
+
+
+def lttb_indices(values, target):
+    """Indeksy punktów wybranych algorytmem Largest-Triangle-Three-Buckets.
+
+    Zachowuje kształt serii (szczyty i doliny) przy target punktach: pierwszy i ostatni
+    punkt zostają, a z każdego z pozostałych koszyków wybierany jest punkt tworzący
+    największy trójkąt z punktem wybranym wcześniej i średnią następnego koszyka.
+    Oś x to pozycje w serii; wartości NaN traktowane są przy wyborze jak 0.
+    """
+    y = np.nan_to_num(np.asarray(values, dtype=float))
+    count = len(y)
+    if target >= count or target < 3:
+        return np.arange(count)
+
+    # Granice koszyków dla punktów 1..count-2
+    edges = np.linspace(1, count - 1, target - 1).astype(int)
+    selected = np.empty(target, dtype=int)
+    selected[0] = 0
+    selected[-1] = count - 1
+    previous = 0
+    for bucket in range(target - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Średnia następnego koszyka (dla ostatniego - ostatni punkt)
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else count
+        mean_x = (next_start + next_end - 1) / 2
+        mean_y = y[next_start:next_end].mean()
+        xs = np.arange(start, end)
+        # Podwojone pole trójkąta (poprzedni punkt, kandydat, średnia następnego koszyka)
+        areas = np.abs((previous - mean_x) * (y[start:end] - y[previous])
+                       - (previous - xs) * (mean_y - y[previous]))
+        previous = start + int(areas.argmax())
+        selected[bucket + 1] = previous
+    return selected
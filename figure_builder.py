@@ -0,0 +1,66 @@
+# figure_builder.py
+import json
+import plotly.graph_objects as go
+
+# True - każdy wykres przechodzi pełną walidację plotly (wolniej; punkt odniesienia w benchmarku)
+VALIDATE_FIGURES = False
+
+
+def _dict_list(value):
+    return isinstance(value, (list, tuple)) and len(value) > 0 and all(isinstance(item, dict) for item in value)
+
+
+def _filled(spec, values, path=""):
+    """Kopia wzorca spec z values wpisanymi w pola zadeklarowane we wzorcu (słowniki zagnieżdżone rekurencyjnie)"""
+    result = dict(spec)
+    for key, value in values.items():
+        if key not in spec:
+            # Pole spoza wzorca nie przeszło walidacji - musi zostać zadeklarowane przy tworzeniu wzorca
+            raise KeyError(f"Pole '{path}{key}' nie występuje we wzorcu")
+        if isinstance(value, dict) and isinstance(spec[key], dict):
+            result[key] = _filled(spec[key], value, f"{path}{key}.")
+        elif _dict_list(value) and _dict_list(spec[key]) and len(value) == len(spec[key]):
+            # Lista obiektów (np. updatemenus, przyciski) - wypełniana element po elemencie
+            result[key] = [_filled(item_spec, item, f"{path}{key}[{i}].")
+                           for i, (item_spec, item) in enumerate(zip(spec[key], value))]
+        else:
+            result[key] = value
+    return result
+
+
+class TraceTemplate:
+    """Wzorzec śladu sprawdzony walidatorami plotly raz, przy tworzeniu.
+
+    Właściwości podaje się jak do konstruktora śladu (np. go.Scatter), a pola wypełniane
+    przy każdym wykresie (x, y, name, kolor...) dostają wartości zastępcze. Wywołanie
+    zwraca zwykły słownik śladu z wpisanymi danymi, bez ponownej walidacji.
+    """
+
+    def __init__(self, trace_class, **properties):
+        self.spec = trace_class(**properties).to_plotly_json()
+
+    def __call__(self, **values):
+        return _filled(self.spec, values)
+
+
+class LayoutTemplate:
+    """Wzorzec układu wykresu sprawdzony raz; zawiera domyślny motyw plotly z chwili utworzenia"""
+
+    def __init__(self, **properties):
+        self.spec = go.Figure(layout=properties).to_plotly_json()['layout']
+
+    def __call__(self, **values):
+        return _filled(self.spec, values)
+
+
+def build_figure(traces, layout):
+    """go.Figure ze słowników śladów i układu zbudowanych z wzorców - bez walidacji każdej właściwości"""
+    spec = {'data': traces, 'layout': layout}
+    if VALIDATE_FIGURES:
+        return go.Figure(spec)
+    return go.Figure(spec, _validate=False)
+
+
+def same_json(fig_a, fig_b):
+    """Czy wykresy serializują się do tego samego JSON-a (kolejność kluczy obiektów nie ma znaczenia)"""
+    return json.loads(fig_a.to_json()) == json.loads(fig_b.to_json())
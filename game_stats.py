@@ -0,0 +1,109 @@
+# game_stats.py
+from collections import defaultdict
+from instrumentation import stage_metrics
+from stats_processing import STAT_MAPPINGS
+from workbook_loader import DEFAULT_ENGINE, load_sheet
+
+# Zakładki z zapisem pojedynczych gier w kolejności rozgrywania
+GAME_SHEETS = ("game 1", "game 2", "game 3")
+# Wersja logiki parsowania zakładek gier - zmiana parsera wymaga podbicia w tym samym commicie,
+# wpisy cache'u gier i baza statystyk sparsowane starszą wersją zostaną pominięte
+# (2: tabele wyszukiwane po nagłówkach 'lp.'/'points' zamiast stałych kolumn)
+PARSER_VERSION = 2
+
+# Wiersz z zapisem akcji kolejnych wymian (np. 'm!1g$4g#4'; 'ef' to błąd przeciwnika)
+RALLY_ROW = 37
+GAME_LAST_ROW = RALLY_ROW
+
+# Nagłówek tabeli w kolumnie kodów akcji (w oryginalnym układzie A i L) - nazwy graczy
+# i ich wartości zaczynają się dwie kolumny dalej
+HEADER_LABEL = 'lp.'
+# Nagłówek tabeli punktów (w oryginalnym układzie M) i wiersze 'scored'/'lost' - wartości kolumnę dalej
+POINTS_HEADER = 'points'
+POINTS_LABELS = {'scored': 'scored points', 'lost': 'lost points'}
+
+# Składowe wzorów punktów w wierszach 30-31 (SUM(C$16,N$17,N$22) i SUM(C$11,C$17,C$18,C$25,N$23,N$24))
+SCORED_ACTIONS = ('ace', 'block', 'attack')
+LOST_ACTIONS = ('enemy ace', 'serve net', 'serve out', 'lost point', 'out', 'attack net')
+
+
+def _header_names(cells):
+    # Nazwy graczy do pierwszej pustej komórki - dalej zaczyna się sąsiednia tabela
+    names = []
+    for name in cells:
+        if not isinstance(name, str) or not name.strip():
+            break
+        names.append(name.lower())
+    return names
+
+
+def count_rallies(rallies, player, code):
+    """Odpowiednik COUNTIF($37:$37, "*"&LEFT(gracz,1)&kod&"*") - liczba wymian zawierających akcję"""
+    pattern = (player[:1] + code).lower()
+    return sum(1 for rally in rallies if pattern in rally)
+
+
+def process_game_sheet(sheet):
+    """Statystyki graczy z jednej zakładki 'game N' w postaci zwracanej przez process_stats.
+
+    Komórki bez zapisanej wartości formuły (plik zapisany programem, który nie
+    przelicza formuł) są liczone od nowa z zapisu wymian w wierszu 37.
+    """
+    rows = list(sheet.iter_rows(min_row=1, max_row=GAME_LAST_ROW, values_only=True))
+    rallies = []
+    if len(rows) >= RALLY_ROW:
+        rallies = [value.lower() for value in rows[RALLY_ROW - 1] if isinstance(value, str)]
+
+    player_stats = defaultdict(lambda: defaultdict(int))
+    # Tabele są rozpoznawane po nagłówkach, więc liczba graczy nie jest stała
+    headers = {}
+    points_column = None
+    points_players = []
+    points_rows = []
+    for row in rows:
+        for column, code in enumerate(row):
+            if code == HEADER_LABEL:
+                headers[column] = _header_names(row[column + 2:])
+            elif code == POINTS_HEADER:
+                points_column = column
+                points_players = _header_names(row[column + 1:])
+            elif code in POINTS_LABELS and column == points_column:
+                points_rows.append((POINTS_LABELS[code], row[column + 1:]))
+            elif code in STAT_MAPPINGS and column in headers:
+                action = STAT_MAPPINGS[code]
+                for i, player in enumerate(headers[column]):
+                    value = row[column + 2 + i] if column + 2 + i < len(row) else None
+                    if not isinstance(value, (int, float)):
+                        value = count_rallies(rallies, player, code)
+                    player_stats[player][action] = value
+
+    # Punkty na końcu - brakujące wartości formuł wyliczamy z już zebranych liczników
+    for action, values in points_rows:
+        components = SCORED_ACTIONS if action == 'scored points' else LOST_ACTIONS
+        for player, value in zip(points_players, values):
+            if not isinstance(value, (int, float)):
+                value = sum(player_stats[player][component] for component in components)
+            player_stats[player][action] = value
+
+    return player_stats
+
+
+def load_game_stats(file_path, sheet_name, engine=DEFAULT_ENGINE):
+    """Parsuje jedną zakładkę gry ze wskazanego pliku; zwraca None gdy jej brak"""
+    sheet = load_sheet(file_path, sheet_name, GAME_LAST_ROW, engine)
+    if sheet is None:
+        return None
+    with stage_metrics.span('sheet_parse'):
+        return process_game_sheet(sheet)
+
+
+def sum_games(games):
+    """Statystyki sesji jako suma statystyk jej gier (jak formuły zakładki 'suma')"""
+    if not games:
+        return None
+    session_stats = defaultdict(lambda: defaultdict(int))
+    for player_stats in games.values():
+        for player, stats in player_stats.items():
+            for action, value in stats.items():
+                session_stats[player][action] += value
+    return session_stats
@@ -0,0 +1,169 @@
+# instrumentation.py
+# Logowanie, pomiary czasu etapów i profilowanie - domyślnie wszystko wyłączone poza
+# tanimi licznikami w pamięci. Włączanie zmiennymi środowiskowymi, np.:
+#   STATS_LOG_LEVEL=DEBUG STATS_METRICS_FILE=metrics.json STATS_PROFILE_DIR=profiles python main.py
+import contextlib
+import cProfile
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+# Nazwa głównego loggera aplikacji - moduły używają loggerów potomnych
+LOGGER_NAME = "volleyball_stats"
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Poziom logowania (np. DEBUG pokazuje zrzuty arkuszy z process_stats)
+LOG_LEVEL_ENV = "STATS_LOG_LEVEL"
+# Plik JSON, do którego po każdej analizie trafia migawka metryk
+METRICS_FILE_ENV = "STATS_METRICS_FILE"
+# Folder na wyniki cProfile - po jednym pliku .prof na żądanie
+PROFILE_DIR_ENV = "STATS_PROFILE_DIR"
+
+
+def get_logger(name):
+    """Logger modułu; bez konfiguracji nic nie wypisuje"""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def configure_logging(level=None):
+    """Włącza wypisywanie logów aplikacji na stderr; bez poziomu - według STATS_LOG_LEVEL"""
+    level = level or os.environ.get(LOG_LEVEL_ENV)
+    if not level:
+        return
+    # Procesy parsujące startują później i czytają poziom ze środowiska
+    os.environ[LOG_LEVEL_ENV] = logging.getLevelName(level) if isinstance(level, int) else level
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    if not any(getattr(handler, '_stats_handler', False) for handler in logger.handlers):
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handler._stats_handler = True
+        logger.addHandler(handler)
+
+
+# Bez handlera logi nie trafiają też do domyślnego handlera 'last resort'
+logging.getLogger(LOGGER_NAME).addHandler(logging.NullHandler())
+# Procesy parsujące ('spawn') importują ten moduł od nowa - konfiguracja ze środowiska obowiązuje i w nich
+configure_logging()
+
+
+class Metrics:
+    """Liczniki i sumaryczne czasy nazwanych etapów, bezpieczne dla wątków.
+
+    Etap to {'count', 'total', 'max'} w sekundach; snapshot() zwraca kopię wszystkiego,
+    a merge() dolicza migawkę z innego procesu (np. z puli parsującej).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._spans = {}
+        self._started = time.time()
+
+    def increment(self, name, count=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + count
+
+    def record(self, name, seconds, count=1):
+        with self._lock:
+            span = self._spans.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+            span['count'] += count
+            span['total'] += seconds
+            span['max'] = max(span['max'], seconds)
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """Mierzy czas bloku i zapisuje go pod nazwą etapu (także gdy blok rzuci wyjątek)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'since': datetime.fromtimestamp(self._started).isoformat(timespec='seconds'),
+                'counters': dict(self._counters),
+                'spans': {name: dict(span) for name, span in self._spans.items()}
+            }
+
+    def merge(self, snapshot):
+        with self._lock:
+            for name, count in snapshot['counters'].items():
+                self._counters[name] = self._counters.get(name, 0) + count
+            for name, other in snapshot['spans'].items():
+                span = self._spans.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+                span['count'] += other['count']
+                span['total'] += other['total']
+                span['max'] = max(span['max'], other['max'])
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._spans.clear()
+            self._started = time.time()
+
+    def write(self, path):
+        """Zapisuje migawkę metryk do pliku JSON (atomowo)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+
+# Metryki procesu - w procesach parsujących zbierane osobno i odsyłane z wynikiem zadania
+stage_metrics = Metrics()
+
+
+def write_metrics_file(path=None):
+    """Zapisuje metryki do pliku ze STATS_METRICS_FILE (lub podanego); bez ścieżki nic nie robi"""
+    path = path or os.environ.get(METRICS_FILE_ENV)
+    if path:
+        stage_metrics.write(path)
+    return path
+
+
+def run_measured(fn, *args):
+    """Wykonuje zadanie w procesie parsującym i zwraca (wynik, metryki zebrane podczas zadania)"""
+    stage_metrics.reset()
+    result = fn(*args)
+    return result, stage_metrics.snapshot()
+
+
+_profile_lock = threading.Lock()
+_profile_counter = itertools.count(1)
+
+
+@contextlib.contextmanager
+def profiled(name, profile_dir=None):
+    """Profiluje blok przez cProfile i zapisuje wynik do <profile_dir>/<name>-<czas>-<n>.prof.
+
+    Bez folderu (ani STATS_PROFILE_DIR) blok wykonuje się bez profilowania. Profiler
+    może działać tylko jeden naraz, więc żądania równoległe do profilowanego nie są profilowane.
+    """
+    profile_dir = profile_dir or os.environ.get(PROFILE_DIR_ENV)
+    if not profile_dir or not _profile_lock.acquire(blocking=False):
+        yield None
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+        os.makedirs(profile_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(profile_dir, f"{name}-{stamp}-{next(_profile_counter)}.prof")
+        profiler.dump_stats(path)
+        get_logger("profile").info("Zapisano profil %s", path)
+    finally:
+        _profile_lock.release()
@@ -1,9 +1,51 @@
 # interface.py
-import os
-import openpyxl
 import gradio as gr
-from stats_processing import process_stats
 from analysis import analyze_stats
+from instrumentation import stage_metrics
+from plots import create_rolling_plot
+from season_archive import list_sessions
+from session_catalog import parse_session_date, session_sort_key
+from watcher import WATCH_INTERVAL, start_watcher
+
+# Kategorie wykresów gracza w kolejności komponentów w zakładce
+PLAYER_CATEGORIES = ['Atak', 'Zagrywka', 'Przyjęcie', 'Rozegranie', 'Inne', 'Punkty']
+
+# Ile analiz może działać naraz (wspólny limit obu przycisków) i ile żądań może czekać w kolejce
+ANALYSIS_CONCURRENCY = 2
+QUEUE_SIZE = 64
+
+# Domyślna liczba sesji w oknie trendów kroczących
+ROLLING_WINDOW = 5
+
+def timed_plot(**kwargs):
+    """gr.Plot mierzący czas serializacji wykresu do JSON wysyłanego przeglądarce"""
+    # Opakowanie metody instancji zamiast podklasy - gradio generuje plik .pyi dla każdej podklasy komponentu
+    plot = gr.Plot(**kwargs)
+    postprocess = plot.postprocess
+    
+    def timed_postprocess(value):
+        if value is None:
+            return None
+        with stage_metrics.span('serialize'):
+            return postprocess(value)
+    
+    plot.postprocess = timed_postprocess
+    return plot
+
+
+def player_choices(players):
+    """Pozycje listy graczy: (nazwa wyświetlana, nazwa z arkusza)"""
+    return [(player.title(), player) for player in players]
+
+
+# Podpowiedź przy liście graczy, zanim jest wynik analizy, z którego można budować wykresy
+NO_ANALYSIS_INFO = "Najpierw uruchom analizę"
+
+
+def roster_selector(players):
+    """Lista graczy z rosteru folderu - nieaktywna, dopóki nie ma wyniku analizy"""
+    return gr.update(choices=player_choices(players), value=None, interactive=False, info=NO_ANALYSIS_INFO)
+
 
 def create_interface():
     with gr.Blocks(title="Analiza Statystyk Siatkówki") as interface:
@@ -13,11 +55,15 @@ def create_interface():
         1. Wybierz pliki Excel do analizy
         2. Lub użyj przycisku 'Analizuj wszystkie' aby przeanalizować wszystkie pliki
         3. Kliknij przycisk 'Analizuj wybrane'
-        4. Przeglądaj wyniki w formie tabeli i wykresów
+        4. Albo przeanalizuj ostatnie N sesji lub sesje z zakresu dat
+        5. Przeglądaj wyniki w formie tabeli i wykresów
         """)
         
         excel_folder = "excel"
-        available_files = [f for f in os.listdir(excel_folder) if f.endswith(".xlsx")] if os.path.exists(excel_folder) else []
+        # Obserwator parsuje nowe pliki w tle i utrzymuje aktualną listę plików i graczy
+        watcher = start_watcher(excel_folder)
+        # Sesje z archiwów sezonów ('<sezon>/<plik>') można wybierać razem z plikami z folderu
+        available_files = list(watcher.files) + list_sessions()
         
         with gr.Row():
             file_selector = gr.Dropdown(
@@ -27,9 +73,23 @@ def create_interface():
                 value=[]
             )
         
+        with gr.Row():
+            granularity = gr.Radio(
+                choices=[("Sesje", "session"), ("Gry", "game")],
+                value="session",
+                label="Trendy: punkt na wykresie to"
+            )
+        
         with gr.Row():
             analyze_selected_btn = gr.Button("Analizuj wybrane", variant="primary")
             analyze_all_btn = gr.Button("Analizuj wszystkie", variant="secondary")
+        
+        with gr.Row():
+            last_sessions = gr.Number(label="Ostatnie N sesji", value=5, precision=0, minimum=1)
+            analyze_last_btn = gr.Button("Analizuj ostatnie", variant="secondary")
+            date_from = gr.Textbox(label="Od (DD.MM.RRRR)", placeholder="01.02.2025")
+            date_to = gr.Textbox(label="Do (DD.MM.RRRR)", placeholder="28.02.2025")
+            analyze_range_btn = gr.Button("Analizuj zakres", variant="secondary")
             
         with gr.Row():
             summary_text = gr.Textbox(
@@ -53,15 +113,22 @@ def create_interface():
         with gr.Tabs() as tabs:
             with gr.Tab("Drużyna"):
                 with gr.Row():
-                    plot_receive = gr.Plot(label="Statystyki przyjęcia")
-                    plot_sets = gr.Plot(label="Statystyki setów")
+                    plot_receive = timed_plot(label="Statystyki przyjęcia")
+                    plot_sets = timed_plot(label="Statystyki setów")
                 
                 with gr.Row():
-                    plot_scored = gr.Plot(label="Zdobyte punkty")
-                    plot_lost = gr.Plot(label="Stracone punkty")
+                    plot_scored = timed_plot(label="Zdobyte punkty")
+                    plot_lost = timed_plot(label="Stracone punkty")
                     
                 with gr.Row():
-                    plot_trend = gr.Plot(label="Trendy drużyny")
+                    plot_trend = timed_plot(label="Trendy drużyny")
+                
+                with gr.Row():
+                    rolling_window = gr.Slider(minimum=1, maximum=20, step=1, value=ROLLING_WINDOW,
+                                               label="Okno średniej kroczącej (sesje)")
+                    show_rolling_btn = gr.Button("Pokaż trendy kroczące")
+                with gr.Row():
+                    plot_rolling = timed_plot(label="Skuteczności kroczące (cały sezon)")
                     
                 with gr.Row():
                     gr.Markdown("""
@@ -83,79 +150,187 @@ def create_interface():
                     - Im wyższa wartość, tym skuteczniejszy atak
                     """)
             
-            # Stwórz słownik do przechowywania komponentów wykresów graczy
-            player_plots = {}
-            
-            # Znajdź początkową listę graczy
-            initial_players = set()
-            if os.path.exists("excel"):
-                for file in os.listdir("excel"):
-                    if file.endswith(".xlsx"):
-                        file_path = os.path.join("excel", file)
-                        workbook = openpyxl.load_workbook(file_path, data_only=True)
-                        if "suma" in workbook.sheetnames:
-                            sheet = workbook["suma"]
-                            stats = process_stats(sheet)
-                            initial_players.update(stats.keys())
+            # Jeden zestaw wykresów dla wybranego gracza - liczba komponentów i rozmiar
+            # odpowiedzi nie rosną z liczbą graczy w archiwum
+            with gr.Tab("Gracze"):
+                with gr.Row():
+                    player_selector = gr.Dropdown(
+                        choices=player_choices(watcher.players),
+                        value=None,
+                        label="Wybierz gracza",
+                        info=NO_ANALYSIS_INFO,
+                        interactive=False
+                    )
+                with gr.Row():
+                    plot_attack = timed_plot(label="Statystyki ataku")
+                    plot_serve = timed_plot(label="Statystyki zagrywki")
+                with gr.Row():
+                    plot_player_receive = timed_plot(label="Statystyki przyjęcia")
+                    plot_player_sets = timed_plot(label="Statystyki rozegrania")
+                with gr.Row():
+                    plot_other = timed_plot(label="Pozostałe statystyki")
+                    plot_points = timed_plot(label="Zdobyte/stracone punkty")
+                player_plots = [plot_attack, plot_serve, plot_player_receive, plot_player_sets,
+                                plot_other, plot_points]
             
-            # Stwórz zakładki dla każdego gracza
-            for player in sorted(initial_players):
-                with gr.Tab(player.title()):
-                    player_plots[player] = {}
-                    with gr.Row():
-                        player_plots[player]['Atak'] = gr.Plot(label=f"Statystyki ataku")
-                        player_plots[player]['Zagrywka'] = gr.Plot(label=f"Statystyki zagrywki")
-                    with gr.Row():
-                        player_plots[player]['Przyjęcie'] = gr.Plot(label=f"Statystyki przyjęcia")
-                        player_plots[player]['Rozegranie'] = gr.Plot(label=f"Statystyki rozegrania")
-                    with gr.Row():
-                        player_plots[player]['Inne'] = gr.Plot(label=f"Pozostałe statystyki")
-                        player_plots[player]['Punkty'] = gr.Plot(label=f"Zdobyte/stracone punkty")
-        
-        def analyze_all():
-            files = [f for f in os.listdir("excel") if f.endswith(".xlsx")]
-            files.sort()
-            summary, fig_receive, fig_sets, fig_scored, fig_lost, df, fig_trend, player_figs = analyze_stats(files)
-            outputs = [summary, fig_receive, fig_sets, fig_scored, fig_lost, df, fig_trend]
-            # Dodaj wykresy graczy w tej samej kolejności co zakładki
-            for player in sorted(player_plots.keys()):
-                if player in player_figs:
-                    for category in ['Atak', 'Zagrywka', 'Przyjęcie', 'Rozegranie', 'Inne', 'Punkty']:
-                        outputs.append(player_figs[player].get(category, None))
-                else:
-                    outputs.extend([None] * 6)
-            return outputs
-        
-        def analyze_selected(selected_files):
+        # Wykresy graczy z ostatniej analizy (budowane leniwie dla wybranego gracza)
+        player_figs_state = gr.State(None)
+        # Licznik zakończonych analiz - sygnał dla wykresów gracza, także gdy wynik przyszedł z cache'u
+        analysis_count = gr.State(0)
+        # Wersja folderu widziana przez tę sesję - odświeżana przez obserwatora
+        watcher_version = gr.State(watcher.version)
+        
+        def render_player(player_figs, player):
+            if not player_figs or player not in player_figs:
+                return [None] * len(PLAYER_CATEGORIES)
+            figures = player_figs[player]
+            return [figures.get(category, None) for category in PLAYER_CATEGORIES]
+        
+        def refresh_players(player_figs, selected):
+            # Po analizie lista to gracze z wyniku; wybór zostaje, jeśli gracz nadal w nim jest -
+            # bez wyboru żadne wykresy nie są budowane
+            if not player_figs:
+                return roster_selector(watcher.players)
+            player = selected if selected in player_figs else None
+            return gr.update(choices=player_choices(player_figs), value=player, interactive=True, info=None)
+        
+        player_selector.change(
+            fn=render_player,
+            inputs=[player_figs_state, player_selector],
+            outputs=player_plots,
+            api_visibility="private"
+        )
+        # Zachowany wybór nie zmienia wartości listy, więc jego wykresy z nowego wyniku
+        # (albo puste, gdy wyboru nie ma) podmienia osobny krok
+        analysis_count.change(
+            fn=refresh_players,
+            inputs=[player_figs_state, player_selector],
+            outputs=[player_selector],
+            api_visibility="private"
+        ).then(
+            fn=render_player,
+            inputs=[player_figs_state, player_selector],
+            outputs=player_plots,
+            api_visibility="private"
+        )
+        
+        def analyze_all(granularity, count):
+            files = list(watcher.files)
+            summary, fig_receive, fig_sets, fig_scored, fig_lost, df, fig_trend, player_figs = analyze_stats(
+                files, granularity=granularity, prefix_index=watcher.index)
+            return [summary, fig_receive, fig_sets, fig_scored, fig_lost, df, fig_trend, player_figs, count + 1]
+        
+        def analyze_selected(selected_files, granularity, count):
             if not selected_files:
-                return [None] * (7 + len(player_plots) * 6)  # 6 wykresów na gracza
-            selected_files.sort()
-            summary, fig_receive, fig_sets, fig_scored, fig_lost, df, fig_trend, player_figs = analyze_stats(selected_files)
-            outputs = [summary, fig_receive, fig_sets, fig_scored, fig_lost, df, fig_trend]
-            
-            # Dodaj wykresy graczy w odpowiedniej kolejności
-            for player in sorted(player_plots.keys()):
-                if player in player_figs:
-                    for category in ['Atak', 'Zagrywka', 'Przyjęcie', 'Rozegranie', 'Inne', 'Punkty']:
-                        outputs.append(player_figs[player].get(category, None))
-                else:
-                    outputs.extend([None] * 6)
-            return outputs
-        
-        # Zaktualizuj handlery przycisków
+                return [None] * 8 + [count + 1]
+            selected_files.sort(key=session_sort_key)
+            # Ciągły zakres sesji z folderu dostaje tabelę podsumowania z sum narastających obserwatora
+            summary, fig_receive, fig_sets, fig_scored, fig_lost, df, fig_trend, player_figs = analyze_stats(
+                selected_files, granularity=granularity, prefix_index=watcher.index)
+            return [summary, fig_receive, fig_sets, fig_scored, fig_lost, df, fig_trend, player_figs, count + 1]
+        
+        # Zapytania o sesje idą do katalogu obserwatora - bez przeglądania folderu
+        def analyze_last(count_sessions, granularity, count):
+            files = watcher.catalog.last(int(count_sessions or 0))
+            if not files:
+                return ["Błąd: Brak sesji z datą w nazwie pliku!"] + [None] * 7 + [count + 1]
+            return analyze_selected(files, granularity, count)
+        
+        def analyze_range(start_text, end_text, granularity, count):
+            start = parse_session_date(start_text.strip()) if start_text and start_text.strip() else None
+            end = parse_session_date(end_text.strip()) if end_text and end_text.strip() else None
+            if (start_text and start_text.strip() and start is None) or (end_text and end_text.strip() and end is None):
+                return ["Błąd: Daty podaj w formacie DD.MM.RRRR!"] + [None] * 7 + [count + 1]
+            files = watcher.catalog.between(start, end)
+            if not files:
+                return ["Błąd: Brak sesji w podanym zakresie dat!"] + [None] * 7 + [count + 1]
+            return analyze_selected(files, granularity, count)
+        
+        # Trendy kroczące z indeksu sum narastających obserwatora - bez ponownej analizy plików
+        def show_rolling(window):
+            index = watcher.index
+            if not index.sessions:
+                return None
+            return create_rolling_plot(index, int(window))
+        
+        def refresh_folder(seen_version, player_figs):
+            # Nic się nie zmieniło - żadnych aktualizacji komponentów
+            if seen_version == watcher.version:
+                return gr.update(), gr.update(), seen_version
+            # Po analizie lista graczy pochodzi z jej wyniku - roster folderu tylko przed pierwszą
+            players = roster_selector(watcher.players) if player_figs is None else gr.update()
+            return gr.update(choices=list(watcher.files) + list_sessions()), players, watcher.version
+        
+        team_outputs = [summary_text, plot_receive, plot_sets, plot_scored, plot_lost,
+                        stats_table, plot_trend, player_figs_state, analysis_count]
+        
         analyze_selected_btn.click(
             fn=analyze_selected,
-            inputs=[file_selector],
-            outputs=[summary_text, plot_receive, plot_sets, plot_scored, plot_lost, 
-                     stats_table, plot_trend] + 
-                     [plot for player_dict in player_plots.values() for plot in player_dict.values()]
+            inputs=[file_selector, granularity, analysis_count],
+            outputs=team_outputs,
+            concurrency_limit=ANALYSIS_CONCURRENCY,
+            concurrency_id="analysis",
+            api_name="analyze_selected"
+        )
+        
+        analyze_last_btn.click(
+            fn=analyze_last,
+            inputs=[last_sessions, granularity, analysis_count],
+            outputs=team_outputs,
+            concurrency_limit=ANALYSIS_CONCURRENCY,
+            concurrency_id="analysis",
+            api_name="analyze_last"
+        )
+        
+        analyze_range_btn.click(
+            fn=analyze_range,
+            inputs=[date_from, date_to, granularity, analysis_count],
+            outputs=team_outputs,
+            concurrency_limit=ANALYSIS_CONCURRENCY,
+            concurrency_id="analysis",
+            api_name="analyze_range"
         )
         
         analyze_all_btn.click(
             fn=analyze_all,
-            outputs=[summary_text, plot_receive, plot_sets, plot_scored, plot_lost, 
-                     stats_table, plot_trend] + 
-                     [plot for player_dict in player_plots.values() for plot in player_dict.values()]
+            inputs=[granularity, analysis_count],
+            outputs=team_outputs,
+            concurrency_limit=ANALYSIS_CONCURRENCY,
+            concurrency_id="analysis",
+            api_name="analyze_all"
+        )
+        
+        show_rolling_btn.click(
+            fn=show_rolling,
+            inputs=[rolling_window],
+            outputs=[plot_rolling],
+            api_name="rolling_trends"
+        )
+        rolling_window.release(
+            fn=show_rolling,
+            inputs=[rolling_window],
+            outputs=[plot_rolling],
+            api_visibility="private"
+        )
+        
+        # Metryki procesu (czasy etapów, trafienia cache'u, sparsowane pliki) jako endpoint API
+        def get_metrics() -> dict:
+            return stage_metrics.snapshot()
+        
+        gr.api(get_metrics, api_name="metrics", concurrency_limit=None)
+        
+        # Nowe, zmienione i usunięte pliki trafiają do listy wyboru bez restartu serwera
+        refresh_timer = gr.Timer(WATCH_INTERVAL)
+        refresh_timer.tick(
+            fn=refresh_folder,
+            inputs=[watcher_version, player_figs_state],
+            outputs=[file_selector, player_selector, watcher_version],
+            show_progress="hidden",
+            concurrency_limit=None,
+            api_visibility="private"
         )
     
+    # Żądania ponad limit czekają w kolejce zamiast uruchamiać kolejne pełne analizy równolegle;
+    # identyczne trwające analizy i tak łączą się w jedną (analysis_flights)
+    interface.queue(max_size=QUEUE_SIZE)
     return interface
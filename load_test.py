@@ -0,0 +1,248 @@
+# load_test.py
+# Test obciążeniowy aplikacji na localhost (bez share=True, bez dostępu do sieci), np.:
+#   python load_test.py --users 20 --requests 10 --selections 8 --output load.json
+# Serwer działa w osobnym procesie, więc mierzona pamięć (RSS) to pamięć samej aplikacji.
+import argparse
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+DEFAULT_PORT = 7861
+# Jak długo czekać na start serwera (sekundy)
+STARTUP_TIMEOUT = 120
+# Co ile sekund próbkować pamięć serwera
+RSS_INTERVAL = 0.2
+
+
+def serve(port):
+    """Uruchamia interfejs na localhost - wywoływane w procesie serwera"""
+    from interface import create_interface
+
+    create_interface().launch(server_name="127.0.0.1", server_port=port, share=False, show_error=True)
+
+
+def _wait_for_port(port, process, timeout=STARTUP_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Serwer zakończył się przed startem (kod {process.returncode})")
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.2)
+    raise RuntimeError(f"Serwer nie wystartował w ciągu {timeout} s")
+
+
+def _rss_kb(pid):
+    # /proc jest dostępne tylko na Linuksie - gdzie indziej pamięci nie raportujemy
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def process_tree_rss_kb(pid):
+    """RSS procesu serwera i jego procesów potomnych (pula parsująca) w KB"""
+    main = _rss_kb(pid)
+    if main is None:
+        return None
+    total = main
+    pending = _children(pid)
+    while pending:
+        child = pending.pop()
+        total += _rss_kb(child) or 0
+        pending.extend(_children(child))
+    return {'server': main, 'total': total}
+
+
+class RssSampler(threading.Thread):
+    """Próbkuje pamięć serwera w tle i pamięta wartości szczytowe"""
+
+    def __init__(self, pid, interval=RSS_INTERVAL):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = None
+        self.last = None
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            sample = process_tree_rss_kb(self.pid)
+            if sample is not None:
+                self.last = sample
+                self.peak = sample if self.peak is None else {
+                    key: max(self.peak[key], sample[key]) for key in sample}
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def percentile(values, fraction):
+    """Percentyl metodą najbliższej rangi"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def latency_report(latencies):
+    return {
+        'count': len(latencies),
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'max': max(latencies) if latencies else None
+    }
+
+
+def make_selections(files, count, size, rng):
+    """Pula różnych wyborów plików, z których losują użytkownicy"""
+    size = max(1, min(size, len(files)))
+    selections = []
+    for _ in range(count):
+        selections.append(sorted(rng.sample(files, rng.randint(1, size))))
+    return selections
+
+
+def run_load(url, selections, users, requests_per_user, all_ratio=0.0, granularity="session", seed=0):
+    """Każdy użytkownik wysyła kolejno requests_per_user kliknięć; zwraca wyniki pojedynczych żądań"""
+    from gradio_client import Client
+
+    # Klienty tworzymy przed pomiarem - pobieranie konfiguracji nie jest częścią obciążenia
+    clients = [Client(url, verbose=False) for _ in range(users)]
+    results = []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(users)
+
+    def user(index):
+        rng = random.Random(seed + index)
+        start_barrier.wait()
+        for _ in range(requests_per_user):
+            if rng.random() < all_ratio:
+                endpoint, args = "/analyze_all", (granularity,)
+            else:
+                endpoint, args = "/analyze_selected", (rng.choice(selections), granularity)
+            started = time.perf_counter()
+            error = None
+            try:
+                clients[index].predict(*args, api_name=endpoint)
+            except Exception as e:
+                error = str(e)
+            elapsed = time.perf_counter() - started
+            with lock:
+                results.append({'endpoint': endpoint, 'seconds': elapsed, 'error': error})
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(users)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test obciążeniowy aplikacji Gradio na localhost")
+    parser.add_argument("--users", type=int, default=10, help="liczba równoczesnych użytkowników")
+    parser.add_argument("--requests", type=int, default=5, help="liczba kliknięć na użytkownika")
+    parser.add_argument("--selections", type=int, default=5, help="liczba różnych wyborów plików w puli")
+    parser.add_argument("--max-files", type=int, default=4, help="największa liczba plików w jednym wyborze")
+    parser.add_argument("--all-ratio", type=float, default=0.0,
+                        help="udział kliknięć 'Analizuj wszystkie' (0-1)")
+    parser.add_argument("--granularity", choices=("session", "game"), default="session")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="plik JSON z wynikami")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args.port)
+        return 0
+
+    files = sorted(f for f in os.listdir("excel") if f.endswith(".xlsx")) if os.path.exists("excel") else []
+    if not files:
+        print("Błąd: brak plików .xlsx w folderze 'excel'", file=sys.stderr)
+        return 1
+    rng = random.Random(args.seed)
+    selections = make_selections(files, args.selections, args.max_files, rng)
+
+    env = dict(os.environ, GRADIO_ANALYTICS_ENABLED="False")
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", "--port", str(args.port)],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_for_port(args.port, server)
+        idle_rss = process_tree_rss_kb(server.pid)
+        sampler = RssSampler(server.pid)
+        sampler.start()
+        try:
+            results, wall = run_load(f"http://127.0.0.1:{args.port}/", selections, args.users, args.requests,
+                                     args.all_ratio, args.granularity, args.seed)
+        finally:
+            sampler.stop()
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    ok = [result['seconds'] for result in results if result['error'] is None]
+    errors = [result for result in results if result['error'] is not None]
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'config': {key: getattr(args, key) for key in
+                   ('users', 'requests', 'selections', 'max_files', 'all_ratio', 'granularity', 'seed')},
+        'wall_seconds': wall,
+        'throughput_rps': len(ok) / wall if wall > 0 else None,
+        'latency': latency_report(ok),
+        'endpoints': {endpoint: latency_report([r['seconds'] for r in results
+                                                if r['endpoint'] == endpoint and r['error'] is None])
+                      for endpoint in sorted({r['endpoint'] for r in results})},
+        'errors': len(errors),
+        'error_samples': sorted({error['error'] for error in errors})[:5],
+        'rss_kb': {'idle': idle_rss, 'peak': sampler.peak, 'final': sampler.last}
+    }
+
+    latency = report['latency']
+    if latency['count']:
+        print(f"Żądania: {latency['count']} udanych, {len(errors)} błędów w {wall:.1f} s "
+              f"({report['throughput_rps']:.2f} żądań/s)")
+        print(f"Opóźnienie: p50 {latency['p50'] * 1000:.0f} ms, p95 {latency['p95'] * 1000:.0f} ms, "
+              f"p99 {latency['p99'] * 1000:.0f} ms")
+    else:
+        print(f"Brak udanych żądań ({len(errors)} błędów)")
+    if sampler.peak:
+        print(f"Pamięć serwera (RSS z procesami potomnymi): szczyt {sampler.peak['total'] / 1024:.0f} MB")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Wyniki zapisano w {args.output}")
+    return 0 if not errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+# metrics.py
+import numpy as np
+import pandas as pd
+from stats_processing import ACTIONS
+
+# Wagi przyjęć w skuteczności przyjęcia (as przeciwnika odejmuje pełne przyjęcie)
+RECEIVE_WEIGHTS = {
+    'good receive': 1.0,
+    'ok receive': 0.66,
+    'bad receive': 0.33,
+    'enemy ace': -1.0
+}
+RECEIVE_ACTIONS = ['good receive', 'ok receive', 'bad receive', 'enemy ace']
+SET_ACTIONS = ['perfect set', 'good set', 'playable set', 'bad set']
+
+
+def safe_ratio(numerator, denominator, scale=100):
+    """Iloraz numerator / denominator * scale; tam, gdzie mianownik nie jest dodatni, wynik to 0.
+
+    Jedyne miejsce, w którym zdefiniowane jest dzielenie przez zero dla wszystkich skuteczności.
+    """
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    result = np.zeros(np.broadcast(numerator, denominator).shape)
+    np.divide(numerator, denominator, out=result, where=denominator > 0)
+    return result * scale
+
+
+def counts_frame(values, index):
+    """DataFrame liczników z tablicy (wiersze x akcje) - kolumny to nazwy akcji"""
+    return pd.DataFrame(values, index=index, columns=list(ACTIONS))
+
+
+def compute_metrics(counts):
+    """Liczy wszystkie sumy i skuteczności naraz dla każdego wiersza DataFrame liczników.
+
+    Wiersze mogą oznaczać graczy, sesje albo pary (sesja, gracz) - obliczenia są
+    kolumnowe, więc kolejne wiersze nie dodają pętli w Pythonie. Brakujące kolumny
+    akcji są traktowane jak zera.
+    """
+    counts = counts.reindex(columns=list(ACTIONS), fill_value=0)
+    metrics = pd.DataFrame(index=counts.index)
+
+    # Atak: błędy to tylko atak w siatkę i aut
+    metrics['attack_errors'] = counts['attack net'] + counts['out']
+    metrics['attack_total'] = counts['attack'] + metrics['attack_errors']
+    metrics['attack_efficiency'] = safe_ratio(counts['attack'], metrics['attack_total'])
+
+    # Zagrywka
+    metrics['serve_errors'] = counts['serve net'] + counts['serve out']
+    metrics['serve_total'] = counts['ace'] + metrics['serve_errors']
+    metrics['serve_efficiency'] = safe_ratio(counts['ace'], metrics['serve_total'])
+
+    # Przyjęcie: rozkład procentowy i skuteczność ważona
+    receives = counts[RECEIVE_ACTIONS]
+    metrics['receive_total'] = receives.sum(axis=1)
+    weighted = sum(counts[action] * weight for action, weight in RECEIVE_WEIGHTS.items())
+    metrics['receive_efficiency'] = safe_ratio(weighted, metrics['receive_total'])
+    for action in RECEIVE_ACTIONS:
+        metrics[f'{action} pct'] = safe_ratio(counts[action], metrics['receive_total'])
+
+    # Rozegranie: perfect i good set liczą się jako udane spośród wszystkich setów
+    metrics['set_total'] = counts[SET_ACTIONS].sum(axis=1)
+    metrics['set_efficiency'] = safe_ratio(counts['perfect set'] + counts['good set'], metrics['set_total'])
+    for action in SET_ACTIONS:
+        metrics[f'{action} pct'] = safe_ratio(counts[action], metrics['set_total'])
+
+    # Punkty zdobyte i stracone według składowych z wykresów drużyny
+    metrics['scored_total'] = counts['attack'] + counts['ace'] + counts['block']
+    metrics['lost_total'] = (metrics['attack_errors'] + metrics['serve_errors'] + counts['bad receive'] +
+                             counts['enemy ace'] + counts['lost point'])
+    return metrics
+
+
+def team_metrics(tensor):
+    """Metryki drużyny w kolejnych sesjach"""
+    return compute_metrics(counts_frame(tensor.team(), tensor.sessions))
@@ -1,430 +1,259 @@
 # plots.py
+import numpy as np
 import plotly.graph_objects as go
 import pandas as pd
+from downsampling import lttb_indices
+from figure_builder import LayoutTemplate, TraceTemplate, build_figure
+from metrics import compute_metrics, team_metrics
+from stats_processing import SUMMARY_COLUMNS
+
+# Wspólny układ wykresów słupkowych drużyny
+BAR_LEGEND = dict(
+    yanchor="top",
+    y=0.99,
+    xanchor="right",
+    x=0.99
+)
+
+# Wzorce śladów i układów sprawdzane przez plotly raz, przy imporcie; puste wartości
+# (x, y, tytuły, kolory) to pola wypełniane przy każdym wykresie
+BAR_TRACE = TraceTemplate(go.Bar, name='', x=[], y=[], marker_color='black', text=[],
+                          textposition='inside', legendgroup='')
+# Napisy "Łącznie" nad słupkami
+TOTALS_TRACE = TraceTemplate(go.Scatter, x=[], y=[], text=[], mode='text', textfont=dict(size=10),
+                             showlegend=False, hoverinfo='skip')
+PERCENT_BAR_LAYOUT = LayoutTemplate(title='', yaxis_title='', barmode='stack', showlegend=True,
+                                    yaxis_range=[0, 120], legend=BAR_LEGEND, margin=dict(t=50, b=50))
+COUNT_BAR_LAYOUT = LayoutTemplate(title='', yaxis_title='', barmode='stack', showlegend=True,
+                                  legend=BAR_LEGEND, margin=dict(t=50, b=50))
+
+# Długość serii trendu (punkty na linię), powyżej której wykres rysuje WebGL (Scattergl) bez znaczników
+WEBGL_POINTS = 200
+# Długość serii, powyżej której linie są upraszczane (LTTB) do DOWNSAMPLE_TARGET punktów -
+# odpowiedź wysyła tylko uproszczone linie, więc jej rozmiar nie rośnie z długością serii
+DOWNSAMPLE_POINTS = 1000
+DOWNSAMPLE_TARGET = 500
+
+def _long_layout(properties):
+    """Układ dla serii uproszczonych: kolejność kategorii osi x wpisywana z pełnej serii"""
+    # Uproszczone linie mają różne podzbiory dat - bez listy kategorii oś ułożyłaby je w kolejności wystąpienia
+    xaxis = dict(properties['xaxis'], categoryorder='array', categoryarray=[])
+    return LayoutTemplate(**dict(properties, xaxis=xaxis))
+
+# Linie skuteczności drużyny (trendy i trendy kroczące)
+EFFICIENCY_TRACE = TraceTemplate(go.Scatter, x=[], y=[], name='', mode='lines+markers',
+                                 line=dict(color='black'), marker=dict(size=8))
+EFFICIENCY_GL_TRACE = TraceTemplate(go.Scattergl, x=[], y=[], name='', mode='lines+markers',
+                                    line=dict(color='black'), marker=dict(size=8))
+EFFICIENCY_LAYOUT_PROPERTIES = dict(
+    title='',
+    xaxis=dict(title='Data treningu'),
+    yaxis_title='Skuteczność (%)',
+    yaxis_range=[-20, 100],
+    showlegend=True,
+    legend=dict(
+        yanchor="top",
+        y=0.99,
+        xanchor="right",
+        x=0.99
+    ),
+    margin=dict(t=50, b=50)
+)
+EFFICIENCY_LAYOUT = LayoutTemplate(**EFFICIENCY_LAYOUT_PROPERTIES)
+EFFICIENCY_LONG_LAYOUT = _long_layout(EFFICIENCY_LAYOUT_PROPERTIES)
+# Skuteczności na wykresach trendów: (kolumna metryk, nazwa, kolor)
+EFFICIENCY_LINES = [
+    ('set_efficiency', 'Skuteczność rozegrania', 'rgb(76, 175, 80)'),
+    ('receive_efficiency', 'Skuteczność przyjęcia', 'rgb(33, 150, 243)'),
+    ('attack_efficiency', 'Skuteczność ataku', 'rgb(255, 87, 34)')
+]
+
+# Wykresy gracza: linie z białą obwódką znaczników, białe tło i jasnoszara siatka
+PLAYER_TRACE = TraceTemplate(go.Scatter, x=[], y=[], name='', mode='lines+markers',
+                             line=dict(color='black', width=2),
+                             marker=dict(size=8, line=dict(color='white', width=1)))
+PLAYER_GL_TRACE = TraceTemplate(go.Scattergl, x=[], y=[], name='', mode='lines+markers',
+                                line=dict(color='black', width=2),
+                                marker=dict(size=8, line=dict(color='white', width=1)))
+PLAYER_GRID = dict(
+    showgrid=True,
+    gridwidth=1,
+    gridcolor='lightgrey',
+    zeroline=True,
+    zerolinewidth=1,
+    zerolinecolor='lightgrey'
+)
+PLAYER_LAYOUT_PROPERTIES = dict(
+    title='',
+    xaxis=dict(title='Data treningu', **PLAYER_GRID),
+    yaxis=dict(title='Wartość', **PLAYER_GRID),
+    showlegend=True,
+    legend=dict(
+        yanchor="top",
+        y=0.99,
+        xanchor="right",
+        x=0.99,
+        bgcolor='rgba(255, 255, 255, 0.8)'
+    ),
+    plot_bgcolor='white',
+    paper_bgcolor='white',
+    margin=dict(t=50, b=50)
+)
+PLAYER_LAYOUT = LayoutTemplate(**PLAYER_LAYOUT_PROPERTIES)
+PLAYER_LONG_LAYOUT = _long_layout(PLAYER_LAYOUT_PROPERTIES)
+
+def _counts_text(values):
+    # Etykiety słupków: liczby całkowite jako tekst, dla wszystkich graczy naraz
+    return values.astype(int).astype(str).tolist()
+
+def _bar_layout(template, title, yaxis_title):
+    return template(title=dict(text=title), yaxis=dict(title=dict(text=yaxis_title)))
+
+def _stacked_bar_figure(players, bars, totals_y, totals_text, layout):
+    """Wykres skumulowany: jeden ślad na kategorię z danymi wszystkich graczy oraz jedna warstwa sum"""
+    if not players:
+        # Nikt nie ma akcji tej kategorii - sam układ, bez pustych śladów
+        return build_figure([], layout)
+    traces = [
+        BAR_TRACE(name=name, x=players, y=y.tolist(), marker=dict(color=color),
+                  text=_counts_text(counts), legendgroup=group)
+        for name, y, counts, color, group in bars
+    ]
+    
+    # Napisy "Łącznie" nad słupkami - jeden ślad tekstowy zamiast adnotacji dla każdego gracza
+    traces.append(TOTALS_TRACE(x=players, y=totals_y, text=totals_text))
+    return build_figure(traces, layout)
 
 def create_plots(df):
     """Tworzy wykresy dla statystyk"""
-    # Wykres przyjęcia - zmieniony na stacked bar chart z procentami
-    fig_receive = go.Figure()
-    
-    # Obliczanie procentowego udziału dla każdego typu przyjęcia
-    for idx, row in df.iterrows():
-        total = row['Dobre przyjęcia'] + row['Średnie przyjęcia'] + row['Złe przyjęcia'] + row['Przyjęte asy']
-        if total > 0:
-            good_percent = (row['Dobre przyjęcia'] / total) * 100
-            ok_percent = (row['Średnie przyjęcia'] / total) * 100
-            bad_percent = (row['Złe przyjęcia'] / total) * 100
-            ace_percent = (row['Przyjęte asy'] / total) * 100
-            
-            # Dodawanie adnotacji z liczbą przyjęć
-            fig_receive.add_annotation(
-                x=row['Gracz'],
-                y=115,
-                text=f'Łącznie: {total}',
-                showarrow=False,
-                font=dict(size=10)
-            )
-            
-            # Dodawanie słupków z procentami
-            fig_receive.add_trace(go.Bar(
-                name='Dobre przyjęcia',
-                x=[row['Gracz']],
-                y=[good_percent],
-                marker_color='rgb(15, 142, 0)',
-                text=[f'{int(row["Dobre przyjęcia"])}'],
-                textposition='inside',
-                legendgroup='good',
-                showlegend=idx == 0
-            ))
-            fig_receive.add_trace(go.Bar(
-                name='Średnie przyjęcia',
-                x=[row['Gracz']],
-                y=[ok_percent],
-                marker_color='rgb(255, 191, 0)',
-                text=[f'{int(row["Średnie przyjęcia"])}'],
-                textposition='inside',
-                legendgroup='ok',
-                showlegend=idx == 0
-            ))
-            fig_receive.add_trace(go.Bar(
-                name='Słabe przyjęcia',
-                x=[row['Gracz']],
-                y=[bad_percent],
-                marker_color='rgb(255, 140, 0)',
-                text=[f'{int(row["Złe przyjęcia"])}'],
-                textposition='inside',
-                legendgroup='bad',
-                showlegend=idx == 0
-            ))
-            fig_receive.add_trace(go.Bar(
-                name='Stracone punkty',
-                x=[row['Gracz']],
-                y=[ace_percent],
-                marker_color='rgb(255, 0, 0)',
-                text=[f'{int(row["Przyjęte asy"])}'],
-                textposition='inside',
-                legendgroup='ace',
-                showlegend=idx == 0
-            ))
+    if df.empty:
+        # Analiza bez graczy - tabela bez kolumn; wykresy zostaną puste
+        df = pd.DataFrame(columns=['Gracz'] + list(SUMMARY_COLUMNS))
+    # Sumy i udziały procentowe dla wszystkich graczy liczone naraz
+    metrics = compute_metrics(df.rename(columns=SUMMARY_COLUMNS))
     
-    fig_receive.update_layout(
-        title='Statystyki przyjęcia (rozkład procentowy)',
-        yaxis_title='Procent przyjęć (%)',
-        barmode='stack',
-        showlegend=True,
-        yaxis_range=[0, 120],
-        legend=dict(
-            yanchor="top",
-            y=0.99,
-            xanchor="right",
-            x=0.99
-        ),
-        margin=dict(t=50, b=50)
+    # Wykres przyjęcia - stacked bar chart z procentami, tylko gracze z przyjęciami
+    shown = (metrics['receive_total'] > 0).to_numpy()
+    rows, m = df[shown], metrics[shown]
+    players = rows['Gracz'].tolist()
+    fig_receive = _stacked_bar_figure(
+        players,
+        [
+            ('Dobre przyjęcia', m['good receive pct'], rows['Dobre przyjęcia'], 'rgb(15, 142, 0)', 'good'),
+            ('Średnie przyjęcia', m['ok receive pct'], rows['Średnie przyjęcia'], 'rgb(255, 191, 0)', 'ok'),
+            ('Słabe przyjęcia', m['bad receive pct'], rows['Złe przyjęcia'], 'rgb(255, 140, 0)', 'bad'),
+            ('Stracone punkty', m['enemy ace pct'], rows['Przyjęte asy'], 'rgb(255, 0, 0)', 'ace')
+        ],
+        [115] * len(players),
+        [f'Łącznie: {total}' for total in m['receive_total'].tolist()],
+        _bar_layout(PERCENT_BAR_LAYOUT, 'Statystyki przyjęcia (rozkład procentowy)', 'Procent przyjęć (%)')
     )
     
-    # Nowy wykres dla setów
-    fig_sets = go.Figure()
-    
-    for idx, row in df.iterrows():
-        total_sets = row['Perfect set'] + row['Good set'] + row['Playable set'] + row['Bad set']
-        if total_sets > 0:
-            perfect_percent = (row['Perfect set'] / total_sets) * 100
-            good_percent = (row['Good set'] / total_sets) * 100
-            playable_percent = (row['Playable set'] / total_sets) * 100
-            bad_percent = (row['Bad set'] / total_sets) * 100
-            
-            fig_sets.add_annotation(
-                x=row['Gracz'],
-                y=115,
-                text=f'Łącznie: {total_sets}',
-                showarrow=False,
-                font=dict(size=10)
-            )
-            
-            fig_sets.add_trace(go.Bar(
-                name='Perfect set',
-                x=[row['Gracz']], y=[perfect_percent],
-                marker_color='rgb(15, 142, 0)',
-                text=[f'{int(row["Perfect set"])}'],
-                textposition='inside',
-                legendgroup='perfect',
-                showlegend=idx == 0
-            ))
-            fig_sets.add_trace(go.Bar(
-                name='Good set',
-                x=[row['Gracz']], y=[good_percent],
-                marker_color='rgb(76, 175, 80)',
-                text=[f'{int(row["Good set"])}'],
-                textposition='inside',
-                legendgroup='good',
-                showlegend=idx == 0
-            ))
-            fig_sets.add_trace(go.Bar(
-                name='Playable set',
-                x=[row['Gracz']], y=[playable_percent],
-                marker_color='rgb(255, 191, 0)',
-                text=[f'{int(row["Playable set"])}'],
-                textposition='inside',
-                legendgroup='playable',
-                showlegend=idx == 0
-            ))
-            fig_sets.add_trace(go.Bar(
-                name='Bad set',
-                x=[row['Gracz']], y=[bad_percent],
-                marker_color='rgb(255, 0, 0)',
-                text=[f'{int(row["Bad set"])}'],
-                textposition='inside',
-                legendgroup='bad',
-                showlegend=idx == 0
-            ))
-    
-    fig_sets.update_layout(
-        title='Statystyki setów (rozkład procentowy)',
-        yaxis_title='Procent setów (%)',
-        barmode='stack',
-        showlegend=True,
-        yaxis_range=[0, 120],
-        legend=dict(
-            yanchor="top",
-            y=0.99,
-            xanchor="right",
-            x=0.99
-        ),
-        margin=dict(t=50, b=50)
+    # Wykres setów
+    shown = (metrics['set_total'] > 0).to_numpy()
+    rows, m = df[shown], metrics[shown]
+    players = rows['Gracz'].tolist()
+    fig_sets = _stacked_bar_figure(
+        players,
+        [
+            ('Perfect set', m['perfect set pct'], rows['Perfect set'], 'rgb(15, 142, 0)', 'perfect'),
+            ('Good set', m['good set pct'], rows['Good set'], 'rgb(76, 175, 80)', 'good'),
+            ('Playable set', m['playable set pct'], rows['Playable set'], 'rgb(255, 191, 0)', 'playable'),
+            ('Bad set', m['bad set pct'], rows['Bad set'], 'rgb(255, 0, 0)', 'bad')
+        ],
+        [115] * len(players),
+        [f'Łącznie: {total}' for total in m['set_total'].tolist()],
+        _bar_layout(PERCENT_BAR_LAYOUT, 'Statystyki setów (rozkład procentowy)', 'Procent setów (%)')
     )
     
     # Wykres zdobytych punktów
-    fig_scored = go.Figure()
-    
-    for idx, row in df.iterrows():
-        attacks = row['Punkty z ataku']
-        aces = row['Asy']
-        blocks = row['Bloki']
-        total_points = attacks + aces + blocks
-        
-        if total_points > 0:
-            fig_scored.add_annotation(
-                x=row['Gracz'],
-                y=total_points + 2,
-                text=f'Łącznie: {total_points}',
-                showarrow=False,
-                font=dict(size=10)
-            )
-            
-            fig_scored.add_trace(go.Bar(
-                name='Atak',
-                x=[row['Gracz']],
-                y=[attacks],
-                marker_color='rgb(19, 102, 10)',
-                text=[f'{int(attacks)}'],
-                textposition='inside',
-                legendgroup='attacks',
-                showlegend=idx == 0
-            ))
-            fig_scored.add_trace(go.Bar(
-                name='Asy',
-                x=[row['Gracz']],
-                y=[aces],
-                marker_color='rgb(76, 175, 80)',
-                text=[f'{int(aces)}'],
-                textposition='inside',
-                legendgroup='aces',
-                showlegend=idx == 0
-            ))
-            fig_scored.add_trace(go.Bar(
-                name='Bloki',
-                x=[row['Gracz']],
-                y=[blocks],
-                marker_color='rgb(129, 199, 132)',
-                text=[f'{int(blocks)}'],
-                textposition='inside',
-                legendgroup='blocks',
-                showlegend=idx == 0
-            ))
-    
-    fig_scored.update_layout(
-        title='Zdobyte punkty',
-        yaxis_title='Liczba punktów',
-        barmode='stack',
-        showlegend=True,
-        legend=dict(
-            yanchor="top",
-            y=0.99,
-            xanchor="right",
-            x=0.99
-        ),
-        margin=dict(t=50, b=50)
+    shown = (metrics['scored_total'] > 0).to_numpy()
+    rows, m = df[shown], metrics[shown]
+    players = rows['Gracz'].tolist()
+    fig_scored = _stacked_bar_figure(
+        players,
+        [
+            ('Atak', rows['Punkty z ataku'], rows['Punkty z ataku'], 'rgb(19, 102, 10)', 'attacks'),
+            ('Asy', rows['Asy'], rows['Asy'], 'rgb(76, 175, 80)', 'aces'),
+            ('Bloki', rows['Bloki'], rows['Bloki'], 'rgb(129, 199, 132)', 'blocks')
+        ],
+        (m['scored_total'] + 2).tolist(),
+        [f'Łącznie: {total}' for total in m['scored_total'].tolist()],
+        _bar_layout(COUNT_BAR_LAYOUT, 'Zdobyte punkty', 'Liczba punktów')
     )
     
     # Wykres straconych punktów
-    fig_lost = go.Figure()
-    
-    for idx, row in df.iterrows():
-        net_attacks = row['Atak w siatkę']
-        outs = row['Aut']
-        serve_errors = row['Zagrywka w siatkę'] + row['Zagrywka na aut']
-        receive_outs = row['Złe przyjęcia']
-        enemy_aces = row['Przyjęte asy']
-        other_lost = row['Stracone punkty (inne)']
-        total_errors = net_attacks + outs + serve_errors + receive_outs + enemy_aces + other_lost
-        
-        if total_errors > 0:
-            fig_lost.add_annotation(
-                x=row['Gracz'],
-                y=total_errors + 2,
-                text=f'Łącznie: {row["Suma straconych"]}',
-                showarrow=False,
-                font=dict(size=10)
-            )
-            
-            fig_lost.add_trace(go.Bar(
-                name='Atak w siatkę',
-                x=[row['Gracz']], y=[net_attacks],
-                marker_color='rgb(255, 159, 34)',
-                text=[f'{int(net_attacks)}'],
-                textposition='inside',
-                legendgroup='net_attacks',
-                showlegend=idx == 0
-            ))
-            fig_lost.add_trace(go.Bar(
-                name='Aut',
-                x=[row['Gracz']], y=[outs],
-                marker_color='rgb(223, 80, 69)',
-                text=[f'{int(outs)}'],
-                textposition='inside',
-                legendgroup='outs',
-                showlegend=idx == 0
-            ))
-            fig_lost.add_trace(go.Bar(
-                name='Błędy zagrywki',
-                x=[row['Gracz']], y=[serve_errors],
-                marker_color='rgb(177, 17, 17)',
-                text=[f'{int(serve_errors)}'],
-                textposition='inside',
-                legendgroup='serve_errors',
-                showlegend=idx == 0
-            ))
-            fig_lost.add_trace(go.Bar(
-                name='Asy przeciwnika',
-                x=[row['Gracz']], y=[enemy_aces],
-                marker_color='rgb(63, 81, 181)',
-                text=[f'{int(enemy_aces)}'],
-                textposition='inside',
-                legendgroup='enemy_aces',
-                showlegend=idx == 0
-            ))
-            fig_lost.add_trace(go.Bar(
-                name='Inne stracone',
-                x=[row['Gracz']], y=[other_lost],
-                marker_color='rgb(156, 39, 176)',
-                text=[f'{int(other_lost)}'],
-                textposition='inside',
-                legendgroup='other_lost',
-                showlegend=idx == 0
-            ))
-    
-    fig_lost.update_layout(
-        title='Stracone punkty',
-        yaxis_title='Liczba punktów',
-        barmode='stack',
-        showlegend=True,
-        legend=dict(
-            yanchor="top",
-            y=0.99,
-            xanchor="right",
-            x=0.99
-        ),
-        margin=dict(t=50, b=50)
+    shown = (metrics['lost_total'] > 0).to_numpy()
+    rows, m = df[shown], metrics[shown]
+    players = rows['Gracz'].tolist()
+    fig_lost = _stacked_bar_figure(
+        players,
+        [
+            ('Atak w siatkę', rows['Atak w siatkę'], rows['Atak w siatkę'], 'rgb(255, 159, 34)', 'net_attacks'),
+            ('Aut', rows['Aut'], rows['Aut'], 'rgb(223, 80, 69)', 'outs'),
+            ('Błędy zagrywki', m['serve_errors'], m['serve_errors'], 'rgb(177, 17, 17)', 'serve_errors'),
+            ('Asy przeciwnika', rows['Przyjęte asy'], rows['Przyjęte asy'], 'rgb(63, 81, 181)', 'enemy_aces'),
+            ('Inne stracone', rows['Stracone punkty (inne)'], rows['Stracone punkty (inne)'], 'rgb(156, 39, 176)', 'other_lost')
+        ],
+        (m['lost_total'] + 2).tolist(),
+        [f'Łącznie: {total}' for total in rows['Suma straconych'].tolist()],
+        _bar_layout(COUNT_BAR_LAYOUT, 'Stracone punkty', 'Liczba punktów')
     )
     
     return fig_receive, fig_sets, fig_scored, fig_lost
 
-def create_trend_plot(selected_files, all_stats):
-    """Tworzy wykres trendów z treningu na trening"""
-    # Przygotuj daty i dane
-    dates = [file.replace('.xlsx', '') for file in selected_files]
-    
-    # Przygotuj dane dla każdego treningu
-    training_data = []
-    for stats in all_stats:
-        team_stats = {
-            'perfect_sets': 0,
-            'good_sets': 0,
-            'bad_sets': 0,
-            'good_receives': 0,
-            'ok_receives': 0,
-            'bad_receives': 0,
-            'enemy_aces': 0,
-            'attacks': 0,
-            'attack_errors': 0,
-            'aces': 0,
-            'serve_errors': 0,
-            'scored_points': 0,
-            'lost_points': 0
-        }
-        
-        # Sumuj statystyki wszystkich graczy
-        for player_stats in stats.values():
-            team_stats['perfect_sets'] += player_stats.get('perfect set', 0)
-            team_stats['good_sets'] += player_stats.get('good set', 0)
-            team_stats['bad_sets'] += player_stats.get('bad set', 0)
-            team_stats['good_receives'] += player_stats.get('good receive', 0)
-            team_stats['ok_receives'] += player_stats.get('ok receive', 0)
-            team_stats['bad_receives'] += player_stats.get('bad receive', 0)
-            team_stats['enemy_aces'] += player_stats.get('enemy ace', 0)
-            team_stats['attacks'] += player_stats.get('attack', 0)
-            team_stats['attack_errors'] += (player_stats.get('attack net', 0) + 
-                                          player_stats.get('out', 0))
-            team_stats['aces'] += player_stats.get('ace', 0)
-            team_stats['serve_errors'] += (player_stats.get('serve net', 0) + 
-                                         player_stats.get('serve out', 0))
-            team_stats['scored_points'] += player_stats.get('scored points', 0)
-            team_stats['lost_points'] += player_stats.get('lost points', 0)
-        
-        # Oblicz skuteczności
-        total_sets = team_stats['perfect_sets'] + team_stats['good_sets'] + team_stats['bad_sets']
-        set_efficiency = ((team_stats['perfect_sets'] + team_stats['good_sets']) / total_sets * 100 
-                         if total_sets > 0 else 0)
-        
-        total_receives = (team_stats['good_receives'] + team_stats['ok_receives'] + 
-                         team_stats['bad_receives'] + team_stats['enemy_aces'])
-        
-        if total_receives > 0:
-            receive_efficiency = ((team_stats['good_receives'] * 1.0 + 
-                                 team_stats['ok_receives'] * 0.66 + 
-                                 team_stats['bad_receives'] * 0.33 - 
-                                 team_stats['enemy_aces'] * 1.0) / total_receives * 100)
-        else:
-            receive_efficiency = 0
-        
-        total_attacks = team_stats['attacks'] + team_stats['attack_errors']
-        attack_efficiency = (team_stats['attacks'] / total_attacks * 100 
-                           if total_attacks > 0 else 0)
-        
-        total_serves = team_stats['aces'] + team_stats['serve_errors']
-        serve_efficiency = (team_stats['aces'] / total_serves * 100 
-                          if total_serves > 0 else 0)
-        
-        training_data.append({
-            'set_efficiency': set_efficiency,
-            'receive_efficiency': receive_efficiency,
-            'attack_efficiency': attack_efficiency,
-            'serve_efficiency': serve_efficiency,
-            'scored_points': team_stats['scored_points'],
-            'lost_points': team_stats['lost_points']
-        })
-
-    # Stwórz wykres
-    fig_trend = go.Figure()
+def _trend_figure(dates, lines, title, templates):
+    """Wykres linii trendu; lines to (wartości, nazwa, kolor), templates - (ślad, ślad WebGL, układ, układ długi).
 
-    # Dodaj linie dla każdego typu skuteczności
-    fig_trend.add_trace(go.Scatter(
-        x=dates,
-        y=[data['set_efficiency'] for data in training_data],
-        name='Skuteczność rozegrania',
-        mode='lines+markers',
-        line=dict(color='rgb(76, 175, 80)'),
-        marker=dict(size=8)
-    ))
+    Do WEBGL_POINTS punktów na linię rysuje zwykłe ślady SVG, dłuższe serie - ślady WebGL
+    bez znaczników, a powyżej DOWNSAMPLE_POINTS tylko linie uproszczone algorytmem LTTB.
+    """
+    trace, gl_trace, layout, long_layout = templates
+    count = len(dates)
+    if count <= WEBGL_POINTS:
+        traces = [trace(x=dates, y=y, name=name, line=dict(color=color)) for y, name, color in lines]
+        return build_figure(traces, layout(title=dict(text=title)))
+    
+    if count <= DOWNSAMPLE_POINTS:
+        traces = [gl_trace(x=dates, y=y, name=name, line=dict(color=color), mode='lines')
+                  for y, name, color in lines]
+        return build_figure(traces, layout(title=dict(text=title)))
+    
+    reduced = []
+    for y, name, color in lines:
+        keep = lttb_indices(np.asarray(y, dtype=float), DOWNSAMPLE_TARGET).tolist()
+        reduced.append(gl_trace(x=[dates[i] for i in keep], y=[y[i] for i in keep], name=name,
+                                line=dict(color=color), mode='lines'))
+    return build_figure(reduced, long_layout(title=dict(text=title), xaxis=dict(categoryarray=dates)))
 
-    fig_trend.add_trace(go.Scatter(
-        x=dates,
-        y=[data['receive_efficiency'] for data in training_data],
-        name='Skuteczność przyjęcia',
-        mode='lines+markers',
-        line=dict(color='rgb(33, 150, 243)'),
-        marker=dict(size=8)
-    ))
+def _efficiency_figure(dates, data, title):
+    """Linie skuteczności rozegrania, przyjęcia i ataku drużyny"""
+    lines = [(data[column].tolist(), name, color) for column, name, color in EFFICIENCY_LINES]
+    return _trend_figure(dates, lines, title,
+                         (EFFICIENCY_TRACE, EFFICIENCY_GL_TRACE, EFFICIENCY_LAYOUT, EFFICIENCY_LONG_LAYOUT))
 
-    fig_trend.add_trace(go.Scatter(
-        x=dates,
-        y=[data['attack_efficiency'] for data in training_data],
-        name='Skuteczność ataku',
-        mode='lines+markers',
-        line=dict(color='rgb(255, 87, 34)'),
-        marker=dict(size=8)
-    ))
+def create_trend_plot(tensor):
+    """Tworzy wykres trendów z treningu na trening"""
+    # Przygotuj daty i dane
+    dates = [file.replace('.xlsx', '') for file in tensor.sessions]
+    
+    # Skuteczności drużyny we wszystkich sesjach naraz
+    training_data = team_metrics(tensor)
 
-    fig_trend.update_layout(
-        title='Trendy skuteczności drużyny',
-        xaxis_title='Data treningu',
-        yaxis_title='Skuteczność (%)',
-        yaxis_range=[-20, 100],
-        showlegend=True,
-        legend=dict(
-            yanchor="top",
-            y=0.99,
-            xanchor="right",
-            x=0.99
-        ),
-        margin=dict(t=50, b=50)
-    )
+    return _efficiency_figure(dates, training_data, 'Trendy skuteczności drużyny')
 
-    return fig_trend
+def create_rolling_plot(index, window):
+    """Wykres kroczących skuteczności drużyny z całego sezonu (okno window ostatnich sesji)"""
+    dates = [file.replace('.xlsx', '') for file in index.sessions]
+    
+    # Sumy okien z indeksu sum narastających - jedno odejmowanie na sesję
+    rolling_data = index.rolling_metrics(window)
+    
+    return _efficiency_figure(dates, rolling_data, f'Skuteczności kroczące drużyny (ostatnie {window} sesji)')
 
-def create_player_trend_plots(player_name, selected_files, all_stats):
+def create_player_trend_plots(player_name, tensor):
     """Tworzy wykresy trendów dla pojedynczego gracza, podzielone na kategorie"""
-    dates = [file.replace('.xlsx', '') for file in selected_files]
+    dates = [file.replace('.xlsx', '') for file in tensor.sessions]
     
     # Zdefiniuj własną paletę wyrazistych kolorów
     vibrant_colors = [
@@ -464,72 +293,14 @@ def create_player_trend_plots(player_name, selected_files, all_stats):
     
     figures = {}
     
-    # Stwórz wykres dla każdej kategorii
+    # Stwórz wykres dla każdej kategorii - z gotowego wzorca, bez walidacji każdej właściwości
     for category_name, stats_list in categories.items():
-        fig = go.Figure()
-        
-        # Dodaj linię dla każdej statystyki w kategorii
-        for i, stat_type in enumerate(stats_list):
-            values = []
-            for stats in all_stats:
-                if player_name.lower() in stats:
-                    values.append(stats[player_name.lower()].get(stat_type, 0))
-                else:
-                    values.append(0)
-            
-            fig.add_trace(go.Scatter(
-                x=dates,
-                y=values,
-                name=stat_type,
-                mode='lines+markers',
-                line=dict(
-                    color=vibrant_colors[i % len(vibrant_colors)],
-                    width=2
-                ),
-                marker=dict(
-                    size=8,
-                    line=dict(
-                        color='white',
-                        width=1
-                    )
-                )
-            ))
-
-        fig.update_layout(
-            title=f'{category_name} - {player_name}',
-            xaxis_title='Data treningu',
-            yaxis_title='Wartość',
-            showlegend=True,
-            legend=dict(
-                yanchor="top",
-                y=0.99,
-                xanchor="right",
-                x=0.99,
-                bgcolor='rgba(255, 255, 255, 0.8)'
-            ),
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            margin=dict(t=50, b=50)
-        )
-        
-        # Dodaj siatkę
-        fig.update_xaxes(
-            showgrid=True,
-            gridwidth=1,
-            gridcolor='lightgrey',
-            zeroline=True,
-            zerolinewidth=1,
-            zerolinecolor='lightgrey'
-        )
-        fig.update_yaxes(
-            showgrid=True,
-            gridwidth=1,
-            gridcolor='lightgrey',
-            zeroline=True,
-            zerolinewidth=1,
-            zerolinecolor='lightgrey'
-        )
-        
-        figures[category_name] = fig
+        # Linia dla każdej statystyki w kategorii
+        lines = [
+            (tensor.series(player_name, stat_type).tolist(), stat_type, vibrant_colors[i % len(vibrant_colors)])
+            for i, stat_type in enumerate(stats_list)
+        ]
+        figures[category_name] = _trend_figure(dates, lines, f'{category_name} - {player_name}',
+                                               (PLAYER_TRACE, PLAYER_GL_TRACE, PLAYER_LAYOUT, PLAYER_LONG_LAYOUT))
     
     return figures
@@ -0,0 +1,109 @@
+# prefix_index.py
+import bisect
+import numpy as np
+import pandas as pd
+from metrics import compute_metrics, counts_frame
+from session_catalog import session_sort_key
+from stats_processing import ACTIONS
+from stats_tensor import StatsTensor
+
+# Sumy narastające mogą przekroczyć zakres int32 liczników pojedynczych sesji (wartości
+# ułamkowe, np. średnie, zostają float64 - typ sum to np.result_type(typ wartości, PREFIX_DTYPE))
+PREFIX_DTYPE = np.int64
+
+
+class PrefixIndex:
+    """Sumy narastające statystyk po sesjach w kolejności chronologicznej.
+
+    cumsum[i] to suma sesji 0..i-1 (tablica gracze x akcje), więc sumy dowolnego
+    ciągłego zakresu sesji to różnica dwóch wierszy - niezależnie od długości zakresu.
+    insert() i remove() zwracają nowy indeks, więc czytający nigdy nie widzą go w
+    połowie aktualizacji. versions pamięta wersje (hash zawartości), z których pochodzą
+    sumy sesji - pozwala sprawdzić, czy indeks jest aktualny dla danego wyboru.
+    """
+
+    def __init__(self, sessions, players, cumsum, versions=None):
+        self.sessions = list(sessions)
+        self.players = list(players)
+        self.cumsum = cumsum
+        self.versions = dict(versions or {})
+        self.keys = [session_sort_key(session) for session in self.sessions]
+        self.session_index = {session: i for i, session in enumerate(self.sessions)}
+        self.player_index = {player: i for i, player in enumerate(self.players)}
+
+    @classmethod
+    def from_tensor(cls, tensor, versions=None):
+        """Indeks z StatsTensor; sesje są porządkowane chronologicznie"""
+        order = sorted(range(len(tensor.sessions)), key=lambda s: session_sort_key(tensor.sessions[s]))
+        values = tensor.values[order]
+        cumsum = np.zeros((len(order) + 1,) + values.shape[1:], dtype=np.result_type(values.dtype, PREFIX_DTYPE))
+        np.cumsum(values, axis=0, out=cumsum[1:])
+        return cls([tensor.sessions[s] for s in order], tensor.players, cumsum, versions)
+
+    @classmethod
+    def from_stats(cls, sessions, all_stats, versions=None):
+        return cls.from_tensor(StatsTensor.from_stats(sessions, all_stats), versions)
+
+    def insert(self, session, player_stats, version=None):
+        """Nowy indeks z dodaną (lub zastąpioną) sesją - dopisanie najnowszej sesji kosztuje jeden wiersz"""
+        index = self.remove(session) if session in self.session_index else self
+        single = StatsTensor.from_stats([session], [player_stats])
+        new_players = [player for player in single.players if player not in index.player_index]
+        players = index.players + new_players
+        dtype = np.result_type(index.cumsum.dtype, single.values.dtype)
+        cumsum = index.cumsum.astype(dtype, copy=False)
+        if new_players:
+            cumsum = np.concatenate([cumsum, np.zeros(cumsum.shape[:1] + (len(new_players), len(ACTIONS)),
+                                                      dtype=dtype)], axis=1)
+        row = np.zeros((len(players), len(ACTIONS)), dtype=dtype)
+        columns = [players.index(player) for player in single.players]
+        row[columns] = single.values[0]
+
+        position = bisect.bisect(index.keys, session_sort_key(session))
+        # Wiersze po wstawionej sesji zawierają ją w swojej sumie
+        cumsum = np.concatenate([cumsum[:position + 1], cumsum[position:] + row])
+        sessions = index.sessions[:position] + [session] + index.sessions[position:]
+        versions = index.versions if version is None else {**index.versions, session: version}
+        return PrefixIndex(sessions, players, cumsum, versions)
+
+    def remove(self, session):
+        """Nowy indeks bez podanej sesji (gracze zostają - ich sumy w pozostałych zakresach się nie zmieniają)"""
+        position = self.session_index.get(session)
+        if position is None:
+            return self
+        row = self.cumsum[position + 1] - self.cumsum[position]
+        cumsum = np.concatenate([self.cumsum[:position + 1], self.cumsum[position + 2:] - row])
+        versions = {name: version for name, version in self.versions.items() if name != session}
+        return PrefixIndex(self.sessions[:position] + self.sessions[position + 1:], self.players, cumsum, versions)
+
+    def span(self, sessions):
+        """Pozycje [low, high), gdy sessions to ciągły zakres sesji indeksu (w tej samej kolejności); inaczej None"""
+        low = self.session_index.get(sessions[0]) if sessions else None
+        if low is None or self.sessions[low:low + len(sessions)] != list(sessions):
+            return None
+        return low, low + len(sessions)
+
+    def totals(self, low=0, high=None):
+        """Sumy gracze x akcje dla sesji na pozycjach [low, high) - dwa odczyty i odejmowanie"""
+        if high is None:
+            high = len(self.sessions)
+        return self.cumsum[high] - self.cumsum[low]
+
+    def merged(self, low=0, high=None):
+        """Sumy zakresu w postaci słowników, jak zwraca merge_stats - dla wszystkich graczy indeksu"""
+        return {player: dict(zip(ACTIONS, row)) for player, row in zip(self.players, self.totals(low, high).tolist())}
+
+    def rolling(self, window, team=False):
+        """Sumy w oknie ostatnich window sesji dla każdej sesji (na początku okna są krótsze)"""
+        cumsum = self.cumsum.sum(axis=1) if team else self.cumsum
+        ends = np.arange(1, len(self.sessions) + 1)
+        starts = np.maximum(ends - window, 0)
+        return cumsum[ends] - cumsum[starts]
+
+    def rolling_metrics(self, window, team=True):
+        """Metryki kroczące: dla drużyny wiersze to sesje, dla graczy pary (sesja, gracz)"""
+        values = self.rolling(window, team)
+        if team:
+            return compute_metrics(counts_frame(values, self.sessions))
+        index = pd.MultiIndex.from_product([self.sessions, self.players], names=['session', 'player'])
+        return compute_metrics(counts_frame(values.reshape(-1, len(ACTIONS)), index))
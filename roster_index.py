@@ -0,0 +1,70 @@
+# roster_index.py
+import json
+import os
+from instrumentation import get_logger
+from stats_cache import CACHE_DIR, write_json_atomic
+from workbook_loader import load_suma_sheet
+
+logger = get_logger("roster_index")
+
+# Manifest graczy dla każdego pliku - pozwala zbudować listę zakładek bez parsowania arkuszy
+ROSTER_FILE = os.path.join(CACHE_DIR, "roster.json")
+ROSTER_FORMAT = 1
+# Wiersz zakładki 'suma' z nazwami graczy
+PLAYERS_ROW = 3
+
+
+def read_players(file_path):
+    """Czyta tylko wiersz z nazwami graczy z zakładki 'suma'"""
+    sheet = load_suma_sheet(file_path, last_row=PLAYERS_ROW)
+    if sheet is None:
+        return []
+    for row in sheet.iter_rows(min_row=PLAYERS_ROW, max_row=PLAYERS_ROW):
+        return [name.lower() for name in row[3:] if name]  # Od kolumny D, jak w process_stats
+    return []
+
+
+def _load_manifest(roster_file):
+    try:
+        with open(roster_file, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format') == ROSTER_FORMAT:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {'format': ROSTER_FORMAT, 'files': {}}
+
+
+def update_roster(excel_folder="excel", roster_file=ROSTER_FILE):
+    """Aktualizuje manifest graczy - otwiera tylko nowe lub zmienione pliki; zwraca {plik: gracze}"""
+    manifest = _load_manifest(roster_file)
+    files = manifest['files']
+    changed = False
+
+    current = {}
+    if os.path.exists(excel_folder):
+        with os.scandir(excel_folder) as entries:
+            for entry in entries:
+                if entry.name.endswith(".xlsx") and entry.is_file():
+                    current[entry.name] = entry.stat()
+
+    for name in [name for name in files if name not in current]:
+        del files[name]
+        changed = True
+
+    for name, stat in current.items():
+        info = files.get(name)
+        if info and info['size'] == stat.st_size and info['mtime_ns'] == stat.st_mtime_ns:
+            continue
+        try:
+            players = read_players(os.path.join(excel_folder, name))
+        except Exception as e:
+            logger.warning("Nie udało się odczytać graczy z %s: %s", name, e)
+            players = []
+        files[name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'players': players}
+        changed = True
+
+    if changed:
+        os.makedirs(os.path.dirname(roster_file) or ".", exist_ok=True)
+        write_json_atomic(roster_file, manifest)
+    return {name: info['players'] for name, info in files.items()}
@@ -0,0 +1,266 @@
+# season_archive.py
+# Archiwum zakończonego sezonu: statystyki sesji jako tablice .npy otwierane przez
+# mapowanie pamięci, bez ponownego parsowania arkuszy. Tworzenie archiwum, np.:
+#   python season_archive.py 2024-25 excel --from 01.09.2024 --to 30.06.2025
+# Sesje archiwum wybiera się w analizie jako '<sezon>/<plik>', np. '2024-25/31.01.2025.xlsx'.
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import numpy as np
+from session_catalog import parse_session_date, session_sort_key
+from stats_processing import ACTIONS, STAT_MAPPINGS
+from stats_tensor import StatsTensor
+
+# Folder z archiwami - każdy sezon w osobnym podfolderze
+ARCHIVE_FOLDER = "archive"
+# Zmiana układu plików wymaga podbicia wersji - starsze archiwa trzeba utworzyć od nowa
+ARCHIVE_FORMAT = 1
+INDEX_FILE = "index.json"
+# Tablice sesje x gracze x akcje i gry x gracze x akcje
+VALUES_FILE = "values.npy"
+GAMES_FILE = "games.npy"
+# Separator sezonu i pliku w nazwie sesji z archiwum
+SEASON_SEPARATOR = "/"
+
+
+def is_archived(file):
+    """Czy nazwa sesji wskazuje sesję z archiwum ('<sezon>/<plik>'), a nie plik z folderu"""
+    return SEASON_SEPARATOR in file
+
+
+def _digest(index, *arrays):
+    digest = hashlib.sha256(json.dumps(index, sort_keys=True).encode('utf-8'))
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+class SeasonArchive:
+    """Sezon zapisany w folderze: index.json oraz tablice values.npy i games.npy.
+
+    Indeks zawiera nazwy graczy (kolejność osi 1), nazwy akcji i kody z arkusza (oś 2),
+    a dla każdej sesji plik, datę, obecnych graczy i zakres jej wierszy w games.npy.
+    Tablice są otwierane przez np.load(mmap_mode='r') - otwarcie archiwum czyta tylko
+    indeks i nic nie kopiuje. Odczyt sesji (tensor, game_tensor, player_totals) czyta
+    z mapowanego pliku tylko ich wiersze i kolumny obecnych graczy - bez przechodzenia
+    przez słowniki statystyk.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.season = os.path.basename(os.path.normpath(directory))
+        with open(os.path.join(directory, INDEX_FILE), encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('format') != ARCHIVE_FORMAT:
+            raise ValueError(f"Archiwum '{directory}' ma nieobsługiwany format {index.get('format')}")
+        self.version = index['version']
+        self.players = index['players']
+        self.sessions = index['sessions']
+        self.games = index['games']
+        self.values = np.load(os.path.join(directory, VALUES_FILE), mmap_mode='r')
+        self.game_values = np.load(os.path.join(directory, GAMES_FILE), mmap_mode='r')
+        self.session_index = {session['file']: i for i, session in enumerate(self.sessions)}
+        # Kolumny akcji w kolejności ACTIONS; None - akcji nie było, gdy tworzono archiwum
+        archived = {action: a for a, action in enumerate(index['actions'])}
+        self._columns = None if index['actions'] == list(ACTIONS) else [archived.get(action) for action in ACTIONS]
+
+    def files(self):
+        """Nazwy sesji '<sezon>/<plik>' w kolejności chronologicznej"""
+        return [f"{self.season}{SEASON_SEPARATOR}{session['file']}" for session in self.sessions]
+
+    def _rows(self, values):
+        """Wiersze tablicy z akcjami w kolejności ACTIONS (bez kopii, gdy kolejność się zgadza)"""
+        if self._columns is None:
+            return values
+        rows = np.zeros(values.shape[:-1] + (len(ACTIONS),), dtype=values.dtype)
+        for a, column in enumerate(self._columns):
+            if column is not None:
+                rows[..., a] = values[..., column]
+        return rows
+
+    def _tensor(self, values, rows, names, present):
+        """StatsTensor z wierszy rows tablicy values; present - indeksy graczy obecnych w każdym wierszu"""
+        order = list(dict.fromkeys(p for players in present for p in players))
+        return StatsTensor(names, [self.players[p] for p in order], self._rows(values[np.ix_(rows, order)]),
+                           [[self.players[p] for p in players] for players in present])._canonical()
+
+    def tensor(self, indices, names):
+        """Tensor sesji indices pod nazwami names (np. '<sezon>/<plik>')"""
+        return self._tensor(self.values, indices, names, [self.sessions[i]['players'] for i in indices])
+
+    def game_tensor(self, i):
+        """Tensor gier sesji i (nazwy gier jako nazwy sesji; pusty, gdy sesja nie miała zakładek gier)"""
+        games = range(*self.sessions[i]['games'])
+        return self._tensor(self.game_values, list(games), [self.games[g]['name'] for g in games],
+                            [self.games[g]['players'] for g in games])
+
+    def player_totals(self, indices):
+        """Sumy graczy obecnych w sesjach indices: {gracz: {akcja: wartość}}"""
+        totals = self._rows(self.values[sorted(indices)].sum(axis=0))
+        present = sorted({p for i in indices for p in self.sessions[i]['players']})
+        return {self.players[p]: dict(zip(ACTIONS, totals[p].tolist())) for p in present}
+
+
+_archives = {}
+_archives_lock = threading.Lock()
+
+
+def open_archive(directory):
+    """Otwarte archiwum sezonu - wspólne dla wszystkich wywołań, otwierane ponownie po zmianie indeksu"""
+    index_path = os.path.join(directory, INDEX_FILE)
+    stat = os.stat(index_path)
+    key = os.path.abspath(directory)
+    with _archives_lock:
+        cached = _archives.get(key)
+        if cached is None or cached[0] != (stat.st_size, stat.st_mtime_ns):
+            cached = ((stat.st_size, stat.st_mtime_ns), SeasonArchive(directory))
+            _archives[key] = cached
+        return cached[1]
+
+
+def find_session(path):
+    """(archiwum, indeks sesji) dla ścieżki '<folder sezonu>/<plik>' albo None, gdy to nie sesja z archiwum"""
+    directory, file = os.path.split(path)
+    if not os.path.isfile(os.path.join(directory, INDEX_FILE)):
+        return None
+    archive = open_archive(directory)
+    i = archive.session_index.get(file)
+    return None if i is None else (archive, i)
+
+
+def list_seasons(archive_folder=ARCHIVE_FOLDER):
+    """Nazwy sezonów zapisanych w folderze archiwów"""
+    if not os.path.isdir(archive_folder):
+        return []
+    return sorted(name for name in os.listdir(archive_folder)
+                  if os.path.isfile(os.path.join(archive_folder, name, INDEX_FILE)))
+
+
+def list_sessions(archive_folder=ARCHIVE_FOLDER, seasons=None):
+    """Nazwy sesji '<sezon>/<plik>' ze wszystkich (lub wybranych) sezonów archiwum"""
+    files = []
+    for season in seasons or list_seasons(archive_folder):
+        files.extend(open_archive(os.path.join(archive_folder, season)).files())
+    return files
+
+
+def write_archive(directory, files, session_stats, game_stats):
+    """Zapisuje sezon: sesje files ze statystykami session_stats i grami game_stats ({gra: statystyki} lub None).
+
+    Folder jest zastępowany w całości; sesje trafiają do archiwum w kolejności chronologicznej.
+    """
+    order = sorted(range(len(files)), key=lambda i: session_sort_key(files[i]))
+    files = [files[i] for i in order]
+    sessions = StatsTensor.from_stats(files, [session_stats[i] for i in order])
+    player_index = sessions.player_index
+
+    game_rows = []
+    index_sessions = []
+    for s, i in enumerate(order):
+        first = len(game_rows)
+        game_rows.extend((game, stats) for game, stats in (game_stats[i] or {}).items())
+        session_date = parse_session_date(files[s])
+        index_sessions.append({
+            'file': files[s],
+            'date': session_date.isoformat() if session_date else None,
+            'players': [player_index[player] for player in sessions.session_players[s]],
+            'games': [first, len(game_rows)]
+        })
+    # Gracze gier w kolejności osi graczy sesji - gra nie wnosi graczy spoza swojej sesji
+    games = StatsTensor.from_stats([game for game, _ in game_rows], [stats for _, stats in game_rows])
+    dtype = np.result_type(sessions.values.dtype, games.values.dtype)
+    values = sessions.values.astype(dtype, copy=False)
+    game_values = np.zeros((len(game_rows), len(sessions.players), len(ACTIONS)), dtype=dtype)
+    if games.players:
+        game_values[:, [player_index[player] for player in games.players]] = games.values
+    index_games = [{'name': game, 'players': [player_index[player] for player in games.session_players[g]]}
+                   for g, (game, _) in enumerate(game_rows)]
+
+    index = {
+        'format': ARCHIVE_FORMAT,
+        'dtype': np.dtype(dtype).name,
+        'players': sessions.players,
+        'actions': list(ACTIONS),
+        # Kody akcji z arkusza - archiwum da się odczytać bez kodu aplikacji
+        'action_codes': {action: code for code, action in STAT_MAPPINGS.items()},
+        'sessions': index_sessions,
+        'games': index_games
+    }
+    index['version'] = _digest(index, values, game_values)
+
+    # Zapis do folderu tymczasowego i podmiana - otwarte archiwum nie zobaczy połowy zapisu
+    tmp_directory = f"{os.path.normpath(directory)}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    np.save(os.path.join(tmp_directory, VALUES_FILE), values)
+    np.save(os.path.join(tmp_directory, GAMES_FILE), game_values)
+    with open(os.path.join(tmp_directory, INDEX_FILE), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.replace(tmp_directory, directory)
+    return open_archive(directory)
+
+
+def archive_season(season, folder, files, archive_folder=ARCHIVE_FOLDER, workers=None):
+    """Wczytuje pliki files z folderu (przez cache i bazę statystyk) i zapisuje je jako sezon season.
+
+    Zwraca (archiwum, {ścieżka: błąd}); pliki z błędem lub bez statystyk są pomijane.
+    """
+    # Import na miejscu - analysis sam czyta archiwa przez ten moduł
+    from analysis import load_session_stats
+    from stats_db import stats_db
+
+    paths = [os.path.join(folder, file) for file in files]
+    # Po load_session_stats wczytane sesje są w bazie - gry czytamy stamtąd, jak game_tensor
+    results, errors = load_session_stats(paths, workers)
+    all_games = stats_db.game_stats(paths)
+    archived = [i for i, stats in enumerate(results) if stats is not None]
+    archive = write_archive(os.path.join(archive_folder, season),
+                            [files[i] for i in archived],
+                            [results[i] for i in archived],
+                            [all_games[i] for i in archived])
+    return archive, errors
+
+
+def main(argv=None):
+    from batch import _date_argument, filter_by_date, find_files
+
+    parser = argparse.ArgumentParser(description="Zapisuje sezon jako archiwum tablic mapowanych z dysku")
+    parser.add_argument("season", help="nazwa sezonu (podfolder w folderze archiwów), np. 2024-25")
+    parser.add_argument("source", nargs="?", default="excel",
+                        help="folder z plikami .xlsx albo wzorzec glob (domyślnie: excel)")
+    parser.add_argument("--from", dest="date_from", type=_date_argument, help="pierwsza data (DD.MM.RRRR)")
+    parser.add_argument("--to", dest="date_to", type=_date_argument, help="ostatnia data (DD.MM.RRRR)")
+    parser.add_argument("--archive-dir", default=ARCHIVE_FOLDER,
+                        help=f"folder archiwów (domyślnie: {ARCHIVE_FOLDER})")
+    parser.add_argument("--workers", type=int, help="liczba procesów parsujących (domyślnie: liczba rdzeni)")
+    args = parser.parse_args(argv)
+
+    if SEASON_SEPARATOR in args.season:
+        print(f"Błąd: nazwa sezonu nie może zawierać '{SEASON_SEPARATOR}'", file=sys.stderr)
+        return 1
+    try:
+        folder, files = find_files(args.source)
+        files, skipped = filter_by_date(files, args.date_from, args.date_to)
+        if not files:
+            raise ValueError(f"Brak plików do archiwizacji w '{args.source}' dla podanego zakresu dat")
+        archive, errors = archive_season(args.season, folder, files, args.archive_dir, args.workers)
+    except (OSError, ValueError) as e:
+        print(f"Błąd: {e}", file=sys.stderr)
+        return 1
+    for file in skipped:
+        print(f"Pominięto {file}: brak daty w nazwie pliku")
+    for path, error in errors.items():
+        print(f"Pominięto {os.path.basename(path)}: {error}")
+    print(f"Zapisano sezon '{archive.season}': {len(archive.sessions)} sesji, {len(archive.players)} graczy "
+          f"w '{archive.directory}'")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# session_catalog.py
+import bisect
+import os
+import threading
+from collections import namedtuple
+from datetime import date, datetime
+from roster_index import update_roster
+
+# Format daty w nazwach plików (np. 31.01.2025.xlsx)
+DATE_FORMAT = "%d.%m.%Y"
+
+# Metadane sesji: plik, data (None gdy nazwa nie jest datą), gracze i wersja (hash
+# zawartości z indeksu cache'u; None, dopóki plik nie został sparsowany w obecnej postaci)
+SessionInfo = namedtuple('SessionInfo', ['file', 'date', 'players', 'version'])
+
+
+def parse_session_date(text):
+    """Data z napisu DD.MM.RRRR (także nazwy pliku z rozszerzeniem); None gdy napis nie jest datą"""
+    try:
+        return datetime.strptime(os.path.basename(text).replace('.xlsx', ''), DATE_FORMAT).date()
+    except ValueError:
+        return None
+
+
+def session_sort_key(file):
+    """Klucz sortowania chronologicznego; pliki bez daty w nazwie trafiają na koniec, alfabetycznie"""
+    session_date = parse_session_date(file)
+    return (session_date is None, session_date or date.min, file)
+
+
+class SessionCatalog:
+    """Indeks sesji z folderu posortowany po dacie z nazwy pliku.
+
+    refresh() sprawdza tylko rozmiar i datę modyfikacji plików (gracze pochodzą z
+    manifestu roster_index, wersja z indeksu cache'u), a zapytania last() i between()
+    to wyszukiwanie w posortowanej liście, bez przeglądania folderu.
+    """
+
+    def __init__(self, excel_folder="excel", cache=None):
+        self.excel_folder = excel_folder
+        self.cache = cache
+        self._sessions = []
+        self._keys = []
+        self._signatures = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, roster=None):
+        """Aktualizuje indeks według zawartości folderu; roster to wynik update_roster, jeśli już policzony"""
+        if roster is None:
+            roster = update_roster(self.excel_folder)
+        previous = {info.file: info for info in self._sessions}
+        signatures = {}
+        sessions = []
+        for file in roster:
+            path = os.path.join(self.excel_folder, file)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            info = previous.get(file)
+            if (info is None or info.version is None or self._signatures.get(file) != signature
+                    or info.players != roster[file]):
+                # Wersja z tego samego sprawdzenia rozmiaru i daty co w cache'u - start nie hashuje plików
+                version = self.cache.known_version(path, stat) if self.cache is not None else None
+                info = SessionInfo(file, parse_session_date(file), list(roster[file]), version)
+            signatures[file] = signature
+            sessions.append(info)
+
+        sessions.sort(key=lambda info: session_sort_key(info.file))
+        with self._lock:
+            self._sessions = sessions
+            self._keys = [session_sort_key(info.file) for info in sessions]
+            self._signatures = signatures
+        return self
+
+    def files(self):
+        return [info.file for info in self._sessions]
+
+    def last(self, count):
+        """Pliki ostatnich count sesji z datą, w kolejności chronologicznej"""
+        with self._lock:
+            dated = bisect.bisect_left(self._keys, (True,))
+            start = max(0, dated - count) if count > 0 else dated
+            return [info.file for info in self._sessions[start:dated]]
+
+    def between(self, start=None, end=None):
+        """Pliki sesji z datą w przedziale [start, end] (daty jako date); brak granicy oznacza bez ograniczenia"""
+        with self._lock:
+            low = 0 if start is None else bisect.bisect_left(self._keys, (False, start))
+            # Klucz (False, end, '\uffff') jest większy od każdej sesji z dnia end
+            high = (bisect.bisect_left(self._keys, (True,)) if end is None
+                    else bisect.bisect_right(self._keys, (False, end, '\uffff')))
+            return [info.file for info in self._sessions[low:high]]
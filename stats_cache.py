@@ -0,0 +1,249 @@
+# stats_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from game_stats import PARSER_VERSION as GAME_PARSER_VERSION
+from instrumentation import stage_metrics
+from stats_processing import PARSER_VERSION
+
+# Katalog cache'u sparsowanych arkuszy "suma"
+CACHE_DIR = ".stats_cache"
+# Górny limit rozmiaru cache'u na dysku (w bajtach)
+MAX_CACHE_BYTES = 50 * 1024 * 1024
+# Zmiana formatu wpisów wymaga podbicia wersji - stare wpisy zostaną pominięte (zmiany logiki
+# parsowania podbijają PARSER_VERSION w module parsera)
+CACHE_FORMAT = 3
+INDEX_FILE = "index.json"
+
+# Znacznik braku wpisu - None oznacza plik bez zakładki 'suma'
+MISSING = object()
+
+
+def pack_stats(player_stats):
+    """Zamienia statystyki graczy na zwartą postać (gracze x akcje) do zapisu w cache"""
+    if player_stats is None:
+        return None
+    players = list(player_stats.keys())
+    actions = sorted({action for stats in player_stats.values() for action in stats})
+    values = [[player_stats[player][action] if action in player_stats[player] else None
+               for action in actions]
+              for player in players]
+    return {'players': players, 'actions': actions, 'values': values}
+
+
+def unpack_stats(packed):
+    """Odtwarza statystyki graczy w postaci zwracanej przez process_stats"""
+    if packed is None:
+        return None
+    player_stats = defaultdict(lambda: defaultdict(int))
+    for player, row in zip(packed['players'], packed['values']):
+        for action, value in zip(packed['actions'], row):
+            if value is not None:
+                player_stats[player][action] = value
+    return player_stats
+
+
+def pack_games(games):
+    """Spakowane statystyki każdej gry sesji {nazwa zakładki: macierz gracze x akcje}"""
+    if games is None:
+        return None
+    return {game: pack_stats(player_stats) for game, player_stats in games.items()}
+
+
+def unpack_games(packed):
+    """Odtwarza {nazwa zakładki: statystyki graczy} zapisane przez pack_games"""
+    if packed is None:
+        return None
+    return {game: unpack_stats(player_stats) for game, player_stats in packed.items()}
+
+
+def file_digest(file_path):
+    """Hash zawartości pliku - używany gdy rozmiar lub data modyfikacji się nie zgadzają"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_json_atomic(path, data):
+    # Zapis atomowy - równoległy odczyt nigdy nie zobaczy połowy pliku
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+class StatsCache:
+    """Trwały cache statystyk z arkuszy "suma", adresowany zawartością pliku.
+
+    Plik jest rozpoznawany po ścieżce, rozmiarze i czasie modyfikacji, a gdy te się
+    nie zgadzają - po hashu zawartości. Każdy wpis to zwarta macierz gracze x akcje
+    zapisana jako osobny plik JSON; najdawniej używane wpisy są usuwane po
+    przekroczeniu limitu rozmiaru. pack i unpack określają postać wpisu - domyślnie
+    statystyki sesji, a dla cache'u gier słownik statystyk każdej gry. name to
+    przedrostek liczników trafień w metrykach. parser_version to wersja parsera, którym
+    sparsowano wpisy - cache zapisany inną wersją jest pomijany.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, pack=pack_stats, unpack=unpack_stats,
+                 name="stats_cache", parser_version=PARSER_VERSION):
+        self.cache_dir = cache_dir
+        self.format = [CACHE_FORMAT, parser_version]
+        self.name = name
+        self.max_bytes = max_bytes
+        self.pack = pack
+        self.unpack = unpack
+        self._lock = threading.Lock()
+        self._index = None
+        self._packed = {}
+
+    def _index_path(self):
+        return os.path.join(self.cache_dir, INDEX_FILE)
+
+    def entry_path(self, digest):
+        """Plik JSON wpisu dla pliku o podanym hashu zawartości"""
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _load_index(self):
+        if self._index is not None:
+            return self._index
+        index = None
+        try:
+            with open(self._index_path(), encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if not index or index.get('format') != self.format:
+            index = {'format': self.format, 'files': {}, 'entries': {}}
+        self._index = index
+        return index
+
+    def _save_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        write_json_atomic(self._index_path(), self._index)
+
+    def _read_entry(self, digest):
+        if digest in self._packed:
+            return self._packed[digest]
+        try:
+            with open(self.entry_path(digest), encoding='utf-8') as f:
+                packed = json.load(f)['stats']
+        except (OSError, ValueError, KeyError):
+            return False
+        self._packed[digest] = packed
+        return packed
+
+    def _drop_entry(self, digest):
+        index = self._index
+        index['entries'].pop(digest, None)
+        self._packed.pop(digest, None)
+        for path in [p for p, info in index['files'].items() if info['hash'] == digest]:
+            del index['files'][path]
+        try:
+            os.remove(self.entry_path(digest))
+        except OSError:
+            pass
+
+    def _evict(self):
+        entries = self._index['entries']
+        total = sum(entry['bytes'] for entry in entries.values())
+        for digest in sorted(entries, key=lambda d: entries[d]['last_used']):
+            if total <= self.max_bytes:
+                break
+            total -= entries[digest]['bytes']
+            self._drop_entry(digest)
+
+    def _lookup(self, key, stat):
+        """Zwraca (hash, spakowane statystyki, czy zapisać indeks); False oznacza brak wpisu"""
+        index = self._load_index()
+        info = index['files'].get(key)
+        if info and info['size'] == stat.st_size and info['mtime_ns'] == stat.st_mtime_ns:
+            digest = info['hash']
+            packed = self._read_entry(digest)
+            if packed is not False:
+                return digest, packed, False
+
+        # Rozmiar lub data się zmieniły - sprawdź, czy zawartość jest już znana
+        digest = file_digest(key)
+        packed = self._read_entry(digest) if digest in index['entries'] else False
+        if packed is not False:
+            self._remember_file(key, stat, digest)
+            return digest, packed, True
+        return digest, False, False
+
+    def _remember_file(self, key, stat, digest):
+        index = self._index
+        previous = index['files'].get(key)
+        index['files'][key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest}
+        # Plik został nadpisany - stary wpis jest nieaktualny, jeśli nic innego go nie używa
+        if previous and previous['hash'] != digest:
+            old = previous['hash']
+            if not any(info['hash'] == old for info in index['files'].values()):
+                self._drop_entry(old)
+
+    def known_version(self, file_path, stat=None):
+        """Hash zawartości z indeksu, gdy rozmiar i data pliku się nie zmieniły; inaczej None (bez czytania pliku)"""
+        path = os.path.abspath(file_path)
+        stat = stat or os.stat(path)
+        with self._lock:
+            info = self._load_index()['files'].get(path)
+        if info and info['size'] == stat.st_size and info['mtime_ns'] == stat.st_mtime_ns:
+            return info['hash']
+        return None
+
+    def version(self, file_path):
+        """Wersja pliku - hash zawartości; przy niezmienionym rozmiarze i dacie bez czytania pliku"""
+        return self.known_version(file_path) or file_digest(os.path.abspath(file_path))
+
+    def get(self, file_path):
+        """Zwraca (statystyki, klucz); przy braku wpisu statystyki to MISSING, a klucz służy do put()"""
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        with self._lock:
+            digest, packed, dirty = self._lookup(path, stat)
+            if packed is False:
+                stage_metrics.increment(f"{self.name}.miss")
+                return MISSING, (path, stat, digest)
+            stage_metrics.increment(f"{self.name}.hit")
+            entry = self._index['entries'].setdefault(digest, {'bytes': 0, 'last_used': 0})
+            entry['last_used'] = time.time()
+            if dirty:
+                self._save_index()
+        return self.unpack(packed), (path, stat, digest)
+
+    def put(self, key, player_stats):
+        """Zapisuje statystyki sparsowane dla klucza zwróconego przez get()"""
+        path, stat, digest = key
+        packed = self.pack(player_stats)
+        with self._lock:
+            self._load_index()
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entry_path = self.entry_path(digest)
+            write_json_atomic(entry_path, {'format': self.format, 'stats': packed})
+            self._packed[digest] = packed
+            self._index['entries'][digest] = {
+                'bytes': os.path.getsize(entry_path),
+                'last_used': time.time()
+            }
+            self._remember_file(path, stat, digest)
+            self._evict()
+            self._save_index()
+        return self.unpack(packed)
+
+    def clear(self):
+        """Usuwa wszystkie wpisy cache'u"""
+        with self._lock:
+            self._load_index()
+            for digest in list(self._index['entries']):
+                self._drop_entry(digest)
+            self._save_index()
+
+
+# Wspólne instancje używane przez aplikację: sesje z zakładki 'suma' i pojedyncze gry
+stats_cache = StatsCache()
+game_cache = StatsCache(os.path.join(CACHE_DIR, "games"), pack=pack_games, unpack=unpack_games, name="game_cache",
+                        parser_version=GAME_PARSER_VERSION)
@@ -0,0 +1,244 @@
+# stats_db.py
+# Baza SQLite ze statystykami wczytanych sesji - źródło danych analiz interfejsu i zadań
+# wsadowych. Pytania ad hoc bez otwierania arkuszy, np.:
+#   python stats_db.py jonatan --last 10
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections import defaultdict
+from metrics import compute_metrics, counts_frame
+from session_catalog import parse_session_date
+from game_stats import PARSER_VERSION as GAME_PARSER_VERSION
+from stats_cache import CACHE_DIR, CACHE_FORMAT
+from stats_processing import ACTIONS, PARSER_VERSION
+
+DB_PATH = os.path.join(CACHE_DIR, "stats.db")
+# Zmiana schematu wymaga podbicia wersji - baza zostanie utworzona od nowa i uzupełniona z cache'u
+DB_FORMAT = 1
+# Wersja zapisana w bazie (PRAGMA user_version) - wiersze pochodzą z parsowania, więc zmiana
+# formatu cache'u lub wersji któregoś parsera też unieważnia bazę, choć hashe plików się nie zmieniły
+DB_VERSION = ((DB_FORMAT * 100 + CACHE_FORMAT) * 100 + PARSER_VERSION) * 100 + GAME_PARSER_VERSION
+# Nazwa "gry" dla statystyk z zakładki 'suma' (tryb wczytywania bez zakładek gier)
+SUMA_GAME = "suma"
+# Folder z plikami aplikacji - domyślny zakres pytań ad hoc (baza trzyma też sesje z innych folderów)
+EXCEL_FOLDER = "excel"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    file TEXT NOT NULL,
+    session_date TEXT,
+    version TEXT NOT NULL,
+    mode TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_date ON sessions (folder, session_date);
+CREATE TABLE IF NOT EXISTS stats (
+    path TEXT NOT NULL,
+    session_date TEXT,
+    game TEXT NOT NULL,
+    player TEXT NOT NULL,
+    action TEXT NOT NULL,
+    value NUMERIC NOT NULL,
+    UNIQUE (path, game, player, action)
+);
+CREATE INDEX IF NOT EXISTS stats_player ON stats (player, session_date);
+CREATE INDEX IF NOT EXISTS stats_date ON stats (session_date);
+CREATE INDEX IF NOT EXISTS stats_action ON stats (action);
+"""
+
+# Lista ścieżek jako jeden parametr JSON - bez limitu liczby parametrów zapytania
+PATHS_FILTER = "path IN (SELECT value FROM json_each(?))"
+
+
+class StatsDB:
+    """Znormalizowane statystyki sesji: wiersz (sesja, data, gra, gracz, akcja, wartość).
+
+    Sesje są kluczowane ścieżką bezwzględną pliku, a tabela sessions pamięta wersję
+    (hash zawartości) i tryb wczytywania, z których pochodzą wiersze - store() zastępuje
+    wszystkie wiersze sesji naraz. Kolejność wstawiania (rowid) zachowuje kolejność graczy
+    i gier z arkusza, więc wyniki zapytań układają się tak samo jak słowniki z parsowania.
+    Każdy wątek ma własne połączenie; zapisy są serializowane, a tryb WAL pozwala czytać w trakcie zapisu.
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._ensure_schema(connection)
+            self._local.connection = connection
+        return connection
+
+    def _ensure_schema(self, connection):
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            if connection.execute("PRAGMA user_version").fetchone()[0] != DB_VERSION:
+                # Baza to pochodna cache'u - starszy format po prostu budujemy od nowa
+                with connection:
+                    connection.execute("DROP TABLE IF EXISTS stats")
+                    connection.execute("DROP TABLE IF EXISTS sessions")
+            connection.executescript(SCHEMA)
+            connection.execute(f"PRAGMA user_version = {DB_VERSION}")
+            self._schema_ready = True
+
+    def versions(self, paths):
+        """{ścieżka: (wersja, tryb)} zapisanych sesji spośród paths"""
+        rows = self._connection().execute(
+            f"SELECT path, version, mode FROM sessions WHERE {PATHS_FILTER}",
+            (json.dumps([os.path.abspath(path) for path in paths]),))
+        return {path: (version, mode) for path, version, mode in rows}
+
+    def store(self, sessions):
+        """Zapisuje sesje [(ścieżka, wersja, tryb, {gra: statystyki graczy} albo None)], zastępując poprzednie wiersze"""
+        connection = self._connection()
+        with self._write_lock, connection:
+            for path, version, mode, games in sessions:
+                path = os.path.abspath(path)
+                file = os.path.basename(path)
+                session_date = parse_session_date(file)
+                session_date = session_date.isoformat() if session_date else None
+                connection.execute("DELETE FROM stats WHERE path = ?", (path,))
+                connection.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?)",
+                                   (path, os.path.dirname(path), file, session_date, version, mode))
+                connection.executemany(
+                    "INSERT INTO stats VALUES (?, ?, ?, ?, ?, ?)",
+                    ((path, session_date, game, player, action, value)
+                     for game, player_stats in (games or {}).items()
+                     for player, stats in player_stats.items()
+                     for action, value in stats.items()))
+
+    def remove(self, paths):
+        """Usuwa sesje (np. po usunięciu plików z folderu)"""
+        paths = json.dumps([os.path.abspath(path) for path in paths])
+        connection = self._connection()
+        with self._write_lock, connection:
+            connection.execute(f"DELETE FROM stats WHERE {PATHS_FILTER}", (paths,))
+            connection.execute(f"DELETE FROM sessions WHERE {PATHS_FILTER}", (paths,))
+
+    def prune(self):
+        """Usuwa sesje, których plików już nie ma (także spoza obserwowanego folderu); zwraca ich liczbę"""
+        paths = [path for path, in self._connection().execute("SELECT path FROM sessions")]
+        missing = [path for path in paths if not os.path.exists(path)]
+        if missing:
+            self.remove(missing)
+        return len(missing)
+
+    def clear(self):
+        connection = self._connection()
+        with self._write_lock, connection:
+            connection.execute("DELETE FROM stats")
+            connection.execute("DELETE FROM sessions")
+
+    def session_stats(self, paths):
+        """Statystyki sesji (suma gier) w kolejności paths; None dla sesji bez wierszy"""
+        paths = [os.path.abspath(path) for path in paths]
+        rows = self._connection().execute(
+            f"SELECT path, player, action, SUM(value), MIN(rowid) AS first FROM stats WHERE {PATHS_FILTER} "
+            "GROUP BY path, player, action ORDER BY path, first",
+            (json.dumps(paths),))
+        sessions = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+        for path, player, action, value, _ in rows:
+            sessions[path][player][action] = value
+        return [sessions[path] if path in sessions else None for path in paths]
+
+    def game_stats(self, paths):
+        """{gra: statystyki graczy} każdej sesji w kolejności paths (gry w kolejności z arkusza); None dla sesji bez wierszy"""
+        paths = [os.path.abspath(path) for path in paths]
+        rows = self._connection().execute(
+            f"SELECT path, game, player, action, value FROM stats WHERE {PATHS_FILTER} ORDER BY path, rowid",
+            (json.dumps(paths),))
+        sessions = defaultdict(dict)
+        for path, game, player, action, value in rows:
+            games = sessions[path]
+            if game not in games:
+                games[game] = defaultdict(lambda: defaultdict(int))
+            games[game][player][action] = value
+        return [sessions.get(path) for path in paths]
+
+    def player_totals(self, paths):
+        """Zsumowane statystyki graczy ze wszystkich podanych sesji - jedno zapytanie agregujące"""
+        rows = self._connection().execute(
+            f"SELECT player, action, SUM(value), MIN(rowid) AS first FROM stats WHERE {PATHS_FILTER} "
+            "GROUP BY player, action ORDER BY first",
+            (json.dumps([os.path.abspath(path) for path in paths]),))
+        totals = defaultdict(lambda: defaultdict(int))
+        for player, action, value, _ in rows:
+            totals[player][action] = value
+        return totals
+
+    def player_history(self, player, last=None, folder=EXCEL_FOLDER):
+        """Sumy akcji gracza z ostatnich last sesji z datą, w których grał (bez last - ze wszystkich).
+
+        Zwraca (liczba sesji, {akcja: wartość}); folder ogranicza sesje do jednego folderu,
+        a folder=None obejmuje wszystkie - kopie pliku w kilku folderach liczą się wtedy raz.
+        """
+        # Jedna ścieżka na wersję (hash zawartości) - ta sama sesja z różnych folderów nie jest sumowana wielokrotnie
+        recent = ("SELECT MIN(path) FROM sessions WHERE session_date IS NOT NULL AND (?1 IS NULL OR folder = ?1) "
+                  "AND path IN (SELECT path FROM stats WHERE player = ?2) "
+                  "GROUP BY version ORDER BY MAX(session_date) DESC, MAX(file) DESC LIMIT ?3")
+        folder = os.path.abspath(folder) if folder else None
+        limit = -1 if last is None else last
+        connection = self._connection()
+        rows = connection.execute(
+            f"SELECT action, SUM(value) FROM stats WHERE player = ?2 AND path IN ({recent}) GROUP BY action",
+            (folder, player, limit))
+        totals = dict(rows.fetchall())
+        count = connection.execute(f"SELECT COUNT(*) FROM ({recent})", (folder, player, limit)).fetchone()[0]
+        return count, totals
+
+    def player_metrics(self, player, last=None, folder=EXCEL_FOLDER):
+        """Sumy i skuteczności gracza z ostatnich last sesji (wiersz metryk jak w compute_metrics)"""
+        count, totals = self.player_history(player, last, folder)
+        values = [[totals.get(action, 0) for action in ACTIONS]]
+        return count, compute_metrics(counts_frame(values, [player])).iloc[0]
+
+
+# Wspólna baza aplikacji
+stats_db = StatsDB()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Skuteczności gracza z bazy statystyk (bez otwierania arkuszy)")
+    parser.add_argument("player", help="nazwa gracza jak w arkuszach (małymi literami)")
+    parser.add_argument("--last", type=int, help="tylko ostatnie N sesji gracza z datą")
+    parser.add_argument("--folder", default=EXCEL_FOLDER, help=f"tylko sesje z tego folderu (domyślnie: {EXCEL_FOLDER})")
+    parser.add_argument("--all-folders", action="store_true",
+                        help="sesje ze wszystkich folderów, które trafiły do bazy (kopie pliku liczone raz)")
+    parser.add_argument("--db", default=DB_PATH, help=f"plik bazy (domyślnie: {DB_PATH})")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"Błąd: brak bazy '{args.db}' - najpierw przeanalizuj pliki w aplikacji lub batch.py", file=sys.stderr)
+        return 1
+    db = StatsDB(args.db)
+    # Sesje usuniętych plików nie wchodzą do wyniku
+    db.prune()
+    count, metrics = db.player_metrics(args.player.lower(), args.last, None if args.all_folders else args.folder)
+    if not count:
+        print(f"Brak sesji gracza '{args.player}' w bazie")
+        return 1
+    print(f"{args.player.upper()} - {count} sesji:")
+    print(f"  Skuteczność ataku: {metrics['attack_efficiency']:.1f}%")
+    print(f"  Skuteczność zagrywki: {metrics['serve_efficiency']:.1f}%")
+    print(f"  Skuteczność przyjęcia: {metrics['receive_efficiency']:.1f}% ({metrics['receive_total']:.0f} przyjęć)")
+    print(f"  Skuteczność rozegrania: {metrics['set_efficiency']:.1f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
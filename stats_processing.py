@@ -1,35 +1,73 @@
 # stats_processing.py
+import logging
 import openpyxl
 from collections import defaultdict
 import pandas as pd
+from instrumentation import get_logger, stage_metrics
+from workbook_loader import DEFAULT_ENGINE, load_suma_sheet
 
-def process_stats(sheet):
-    # Debug - print entire sheet contents
-    print("\nDEBUG - Zawartość zakładki 'suma':")
-    print("-" * 50)
-    
-    # Find the dimensions of the used range
+logger = get_logger("stats_processing")
+
+# Wersja logiki parsowania zakładki 'suma' - zmiana parsera wymaga podbicia w tym samym commicie,
+# wpisy cache'u i baza statystyk sparsowane starszą wersją zostaną pominięte
+PARSER_VERSION = 1
+
+# Mapowanie kategorii i akcji
+STAT_MAPPINGS = {
+    '!1': 'good receive',
+    '!2': 'ok receive',
+    '!3': 'bad receive',
+    '!4': 'enemy ace',
+    '@1': 'ace',           # Asy serwisowe
+    '@2': 'serve net',     # Zagrywka w siatkę
+    '@3': 'serve out',     # Zagrywka na aut
+    '#1': 'position error',
+    '#2': 'stance error',
+    '#3': 'free ball',
+    '#4': 'lost point',
+    '$1': 'perfect set',
+    '$2': 'good set',
+    '$3': 'playable set',
+    '$4': 'bad set',
+    '%1': 'dig',
+    '%2': 'block',
+    '^1': 'attack',
+    '^2': 'out',
+    '^3': 'attack net'
+}
+
+# Wszystkie akcje: kody z arkusza oraz sumy z wierszy 'scored'/'lost'
+ACTIONS = tuple(STAT_MAPPINGS.values()) + ('scored points', 'lost points')
+
+def _log_sheet(sheet):
+    """Zrzut zawartości zakładki 'suma' komórka po komórce (tylko przy poziomie DEBUG)"""
     max_row = sheet.max_row
     max_col = sheet.max_column
     
-    # Print column letters for reference
-    col_headers = "    " # indent for row numbers
+    # Litery kolumn jako nagłówek
+    col_headers = "    " # wcięcie na numery wierszy
     for col in range(1, max_col + 1):
         col_letter = openpyxl.utils.get_column_letter(col)
         col_headers += f"{col_letter:^10}"
-    print(col_headers)
-    print("-" * (max_col * 10 + 4))
+    lines = ["Zawartość zakładki 'suma':", "-" * 50, col_headers, "-" * (max_col * 10 + 4)]
     
-    # Print each row with row number
+    # Każdy wiersz z numerem
     for row_idx, row in enumerate(sheet.iter_rows(values_only=True), 1):
         row_str = f"{row_idx:3d}|"
         for value in row:
             if value is None:
                 value = ""
             row_str += f"{str(value):^10}"
-        print(row_str)
+        lines.append(row_str)
     
-    print("-" * 50)
+    lines.append("-" * 50)
+    logger.debug("\n".join(lines))
+
+def process_stats(sheet):
+    # Zrzut arkusza kosztuje tyle co samo parsowanie - budujemy go tylko, gdy ktoś go czyta
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        _log_sheet(sheet)
     
     # Słownik na statystyki graczy
     player_stats = defaultdict(lambda: defaultdict(int))
@@ -38,45 +76,21 @@ def process_stats(sheet):
     players = []
     for row in sheet.iter_rows(min_row=3, max_row=3, values_only=True):
         players = [name.lower() for name in row[3:] if name]  # Start from column D (index 3)
-        print(f"\nDEBUG - Znalezieni gracze: {players}")
+        logger.debug("Znalezieni gracze: %s", players)
         break
     
     if not players:
-        print("\nDEBUG - Nie znaleziono graczy!")
+        logger.debug("Nie znaleziono graczy!")
         return {}
 
-    # Mapowanie kategorii i akcji
-    stat_mappings = {
-        '!1': 'good receive',
-        '!2': 'ok receive',
-        '!3': 'bad receive',
-        '!4': 'enemy ace',
-        '@1': 'ace',           # Asy serwisowe
-        '@2': 'serve net',     # Zagrywka w siatkę
-        '@3': 'serve out',     # Zagrywka na aut
-        '#1': 'position error',
-        '#2': 'stance error',
-        '#3': 'free ball',
-        '#4': 'lost point',
-        '$1': 'perfect set',
-        '$2': 'good set',
-        '$3': 'playable set',
-        '$4': 'bad set',
-        '%1': 'dig',
-        '%2': 'block',
-        '^1': 'attack',
-        '^2': 'out',
-        '^3': 'attack net'
-    }
-
     # Przetwarzanie statystyk
     for row in sheet.iter_rows(min_row=4, max_row=25, values_only=True):
         if not row[1]:  # Pomijamy puste wiersze
             continue
             
         action_code = row[1]  # Kolumna B zawiera kody akcji
-        if action_code in stat_mappings:
-            action = stat_mappings[action_code]
+        if action_code in STAT_MAPPINGS:
+            action = STAT_MAPPINGS[action_code]
             
             # Iteruj przez wartości dla każdego gracza (kolumny D-K)
             for i, value in enumerate(row[3:]):
@@ -90,26 +104,33 @@ def process_stats(sheet):
                 if i < len(players) and isinstance(value, (int, float)):
                     player_stats[players[i]][action] = value
 
-    # Debug print - końcowe statystyki
-    print("\nDEBUG - Końcowe statystyki:")
-    for player, stats in player_stats.items():
-        print(f"\n{player}:")
-        for action, value in stats.items():
-            print(f"  {action}: {value}")
+    # Końcowe statystyki
+    if debug:
+        lines = ["Końcowe statystyki:"]
+        for player, stats in player_stats.items():
+            lines.append(f"{player}:")
+            lines.extend(f"  {action}: {value}" for action, value in stats.items())
+        logger.debug("\n".join(lines))
     
     return player_stats
 
+def load_workbook_stats(file_path, engine=DEFAULT_ENGINE):
+    """Parsuje zakładkę 'suma' ze wskazanego pliku; zwraca None gdy jej brak"""
+    sheet = load_suma_sheet(file_path, engine=engine)
+    if sheet is None:
+        return None
+    with stage_metrics.span('sheet_parse'):
+        return process_stats(sheet)
+
 def merge_stats(all_stats):
-    merged_stats = defaultdict(lambda: defaultdict(int))
-    for stats in all_stats:
-        for player, player_stats in stats.items():
-            player = player.lower()  # Konwertujemy na małe litery
-            for action, value in player_stats.items():
-                if isinstance(value, (int, float)):  # Upewniamy się, że wartość jest liczbą
-                    merged_stats[player][action] += value
-    return merged_stats
+    # Import lokalny - stats_tensor korzysta z ACTIONS zdefiniowanych w tym module
+    from stats_tensor import StatsTensor
+    return StatsTensor.from_stats(range(len(all_stats)), all_stats).merged()
 
 def format_player_stats(player_stats, is_summary=False):
+    # Import lokalny - metrics korzysta z ACTIONS zdefiniowanych w tym module
+    from metrics import compute_metrics
+    
     if not player_stats:
         return "Nie znaleziono statystyk graczy\n"
     
@@ -117,131 +138,80 @@ def format_player_stats(player_stats, is_summary=False):
     output = title
     output += "-" * 50 + "\n"
     
-    for player, stats in player_stats.items():
+    counts = pd.DataFrame([[stats.get(action, 0) for action in ACTIONS] for stats in player_stats.values()],
+                          index=list(player_stats.keys()), columns=list(ACTIONS))
+    metrics = compute_metrics(counts)
+    
+    for player, stats in counts.iterrows():
         output += f"\n{player.upper()}:\n"
         
         # Statystyki ataku
-        attacks = stats.get('attack', 0)  # punkty z ataku
-        attack_errors = stats.get('attack net', 0) + stats.get('out', 0)  # tylko net i out
-        total_attacks = attacks + attack_errors
-        if total_attacks > 0:
-            attack_efficiency = (attacks / total_attacks) * 100
-        else:
-            attack_efficiency = 0
-            
         output += f"ATAK:\n"
-        output += f"  Punkty: {attacks}\n"
-        output += f"  Błędy: {attack_errors}\n"
-        output += f"  Skuteczność: {attack_efficiency:.1f}%\n"
+        output += f"  Punkty: {stats['attack']}\n"
+        output += f"  Błędy: {metrics.at[player, 'attack_errors']}\n"
+        output += f"  Skuteczność: {metrics.at[player, 'attack_efficiency']:.1f}%\n"
         
         # Statystyki zagrywki
-        aces = stats.get('ace', 0)  # Używamy 'ace' zamiast '@1'
-        serve_errors = stats.get('serve net', 0) + stats.get('serve out', 0)
-        total_serves = aces + serve_errors
-        if total_serves > 0:
-            serve_efficiency = (aces / total_serves) * 100
-        else:
-            serve_efficiency = 0
-            
         output += f"\nZAGRYWKA:\n"
-        output += f"  Asy: {aces}\n"
-        output += f"  Błędy: {serve_errors}\n"
-        output += f"  Skuteczność: {serve_efficiency:.1f}%\n"
+        output += f"  Asy: {stats['ace']}\n"
+        output += f"  Błędy: {metrics.at[player, 'serve_errors']}\n"
+        output += f"  Skuteczność: {metrics.at[player, 'serve_efficiency']:.1f}%\n"
         
         # Statystyki przyjęcia
-        good_receives = stats.get('good receive', 0)
-        ok_receives = stats.get('ok receive', 0)
-        bad_receives = stats.get('bad receive', 0)
-        enemy_aces = stats.get('enemy ace', 0)
-        total_receives = good_receives + ok_receives + bad_receives + enemy_aces
-        
-        if total_receives > 0:
-            # Nowa formuła: tylko dobre i średnie jako udane
-            receive_efficiency = ((good_receives + ok_receives) / total_receives) * 100
-        else:
-            receive_efficiency = 0
-        
         output += f"\nPRZYJĘCIE:\n"
-        output += f"  Idealne: {good_receives}\n"
-        output += f"  Dość dobre: {ok_receives}\n"
-        output += f"  Słabe: {bad_receives}\n"
-        output += f"  Asy przeciwnika: {enemy_aces}\n"
-        output += f"  Łącznie przyjęć: {total_receives}\n"
-        output += f"  Skuteczność: {receive_efficiency:.1f}%\n"
+        output += f"  Idealne: {stats['good receive']}\n"
+        output += f"  Dość dobre: {stats['ok receive']}\n"
+        output += f"  Słabe: {stats['bad receive']}\n"
+        output += f"  Asy przeciwnika: {stats['enemy ace']}\n"
+        output += f"  Łącznie przyjęć: {metrics.at[player, 'receive_total']}\n"
+        output += f"  Skuteczność: {metrics.at[player, 'receive_efficiency']:.1f}%\n"
         
         # Pozostałe statystyki
-        blocks = stats.get('block', 0)
-        free_balls = stats.get('free ball', 0)
-        
         output += f"\nPOZOSTAŁE:\n"
-        output += f"  Bloki: {blocks}\n"
-        output += f"  Free ball: {free_balls}\n"
+        output += f"  Bloki: {stats['block']}\n"
+        output += f"  Free ball: {stats['free ball']}\n"
         output += "-" * 30 + "\n"
     
     return output
 
+# Kolumny tabeli podsumowania i akcje, z których pochodzą
+SUMMARY_COLUMNS = {
+    # Atak
+    'Punkty z ataku': 'attack',
+    'Atak w siatkę': 'attack net',
+    'Aut': 'out',
+    'Błędy pozycji': 'position error',
+    'Błędy postawy': 'stance error',
+    # Zagrywka
+    'Asy': 'ace',
+    'Zagrywka w siatkę': 'serve net',
+    'Zagrywka na aut': 'serve out',
+    # Przyjęcie
+    'Dobre przyjęcia': 'good receive',
+    'Średnie przyjęcia': 'ok receive',
+    'Złe przyjęcia': 'bad receive',
+    'Przyjęte asy': 'enemy ace',
+    # Rozegranie
+    'Perfect set': 'perfect set',
+    'Good set': 'good set',
+    'Playable set': 'playable set',
+    'Bad set': 'bad set',
+    # Obrona i inne
+    'Dig': 'dig',
+    'Bloki': 'block',
+    'Free ball': 'free ball',
+    'Stracone punkty (inne)': 'lost point',  # Z #4
+    # Sumy punktów
+    'Suma zdobytych': 'scored points',  # Z wiersza 24
+    'Suma straconych': 'lost points'  # Z wiersza 25
+}
+
 def create_player_summary_df(player_stats):
     """Tworzy DataFrame z podsumowaniem statystyk gracza"""
     data = []
     for player, stats in player_stats.items():
-        # Atak
-        attacks = stats.get('attack', 0)
-        attack_nets = stats.get('attack net', 0)
-        outs = stats.get('out', 0)
-        position_errors = stats.get('position error', 0)
-        stance_errors = stats.get('stance error', 0)
-        
-        # Zagrywka
-        aces = stats.get('ace', 0)
-        serve_nets = stats.get('serve net', 0)
-        serve_outs = stats.get('serve out', 0)
-        
-        # Przyjęcie
-        good_receives = stats.get('good receive', 0)
-        ok_receives = stats.get('ok receive', 0)
-        bad_receives = stats.get('bad receive', 0)
-        enemy_aces = stats.get('enemy ace', 0)
-        
-        # Rozegranie
-        perfect_sets = stats.get('perfect set', 0)
-        good_sets = stats.get('good set', 0)
-        playable_sets = stats.get('playable set', 0)
-        bad_sets = stats.get('bad set', 0)
-        
-        # Obrona i inne
-        digs = stats.get('dig', 0)
-        blocks = stats.get('block', 0)
-        free_balls = stats.get('free ball', 0)
-        lost_points = stats.get('lost point', 0)  # Punkty stracone z #4
-        
-        # Sumy punktów
-        scored_points = stats.get('scored points', 0)  # Z wiersza 24
-        lost_points_total = stats.get('lost points', 0)  # Z wiersza 25
-        
-        data.append({
-            'Gracz': player,
-            'Punkty z ataku': attacks,
-            'Atak w siatkę': attack_nets,
-            'Aut': outs,
-            'Błędy pozycji': position_errors,
-            'Błędy postawy': stance_errors,
-            'Asy': aces,
-            'Zagrywka w siatkę': serve_nets,
-            'Zagrywka na aut': serve_outs,
-            'Dobre przyjęcia': good_receives,
-            'Średnie przyjęcia': ok_receives,
-            'Złe przyjęcia': bad_receives,
-            'Przyjęte asy': enemy_aces,
-            'Perfect set': perfect_sets,
-            'Good set': good_sets,
-            'Playable set': playable_sets,
-            'Bad set': bad_sets,
-            'Dig': digs,
-            'Bloki': blocks,
-            'Free ball': free_balls,
-            'Stracone punkty (inne)': lost_points,  # Z #4
-            'Suma zdobytych': scored_points,  # Z wiersza 24
-            'Suma straconych': lost_points_total  # Z wiersza 25
-        })
+        row = {'Gracz': player}
+        row.update({column: stats.get(action, 0) for column, action in SUMMARY_COLUMNS.items()})
+        data.append(row)
     
     return pd.DataFrame(data)
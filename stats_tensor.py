@@ -0,0 +1,132 @@
+# stats_tensor.py
+from collections import defaultdict
+import numpy as np
+from stats_processing import ACTIONS
+
+# Indeksy akcji w ostatnim wymiarze tablicy
+ACTION_INDEX = {action: i for i, action in enumerate(ACTIONS)}
+
+# Liczniki z arkuszy są całkowite - int32 wystarcza i zajmuje połowę miejsca float64
+COUNT_DTYPE = np.int32
+
+
+class StatsTensor:
+    """Statystyki wielu sesji jako tablica NumPy indeksowana (sesja, gracz, akcja).
+
+    Obok tablicy trzymane są tabele indeksów: sessions (nazwy plików w kolejności
+    osi 0) i players (nazwy graczy małymi literami w kolejności pierwszego wystąpienia).
+    session_players pamięta graczy obecnych w każdej sesji - pozwala wybierać i łączyć
+    sesje z zachowaniem tej samej kolejności graczy co przy budowie od zera.
+    """
+
+    def __init__(self, sessions, players, values, session_players=None):
+        self.sessions = list(sessions)
+        self.players = list(players)
+        self.values = values
+        self.session_index = {session: i for i, session in enumerate(self.sessions)}
+        self.player_index = {player: i for i, player in enumerate(self.players)}
+        if session_players is None:
+            session_players = [list(self.players)] * len(self.sessions)
+        self.session_players = list(session_players)
+
+    @classmethod
+    def from_stats(cls, sessions, all_stats):
+        """Buduje tablicę z listy słowników zwracanych przez process_stats (jeden na sesję)"""
+        player_index = {}
+        session_players = []
+        for stats in all_stats:
+            present = []
+            for player in stats:
+                player = player.lower()
+                player_index.setdefault(player, len(player_index))
+                if player not in present:
+                    present.append(player)
+            session_players.append(present)
+
+        entries = []
+        integral = True
+        for s, stats in enumerate(all_stats):
+            for player, player_stats in stats.items():
+                p = player_index[player.lower()]
+                for action, value in player_stats.items():
+                    a = ACTION_INDEX.get(action)
+                    if a is None or not isinstance(value, (int, float)):
+                        continue
+                    if isinstance(value, float) and not value.is_integer():
+                        integral = False
+                    entries.append((s, p, a, value))
+
+        values = np.zeros((len(all_stats), len(player_index), len(ACTIONS)),
+                          dtype=COUNT_DTYPE if integral else np.float64)
+        if entries:
+            s, p, a, v = zip(*entries)
+            # add.at sumuje powtórzenia (ten sam gracz zapisany różną wielkością liter)
+            np.add.at(values, (np.array(s), np.array(p), np.array(a)), np.array(v, dtype=values.dtype))
+        return cls(sessions, player_index, values, session_players)
+
+    def _canonical(self):
+        """Przywraca kolejność graczy według pierwszego wystąpienia i usuwa graczy bez sesji.
+
+        Typ tablicy też wraca do tego, jaki dałoby from_stats (int32, gdy wszystkie wartości są całkowite).
+        """
+        if self.values.dtype != COUNT_DTYPE and np.array_equal(self.values, np.round(self.values)):
+            self.values = self.values.astype(COUNT_DTYPE)
+        order = []
+        seen = set()
+        for present in self.session_players:
+            for player in present:
+                if player not in seen:
+                    seen.add(player)
+                    order.append(player)
+        if order == self.players:
+            return self
+        permutation = [self.player_index[player] for player in order]
+        return StatsTensor(self.sessions, order, self.values[:, permutation, :], self.session_players)
+
+    def select(self, sessions):
+        """Nowy tensor z podanymi sesjami w podanej kolejności (gracze bez żadnej z nich są pomijani)"""
+        rows = [self.session_index[session] for session in sessions]
+        return StatsTensor(sessions, self.players, self.values[rows],
+                           [self.session_players[row] for row in rows])._canonical()
+
+    @classmethod
+    def concat(cls, tensors, sessions):
+        """Łączy tensory rozłącznych zbiorów sesji w jeden z sesjami w kolejności sessions"""
+        player_index = {}
+        for tensor in tensors:
+            for player in tensor.players:
+                player_index.setdefault(player, len(player_index))
+        dtype = np.result_type(COUNT_DTYPE, *(tensor.values.dtype for tensor in tensors))
+        values = np.zeros((sum(len(tensor.sessions) for tensor in tensors), len(player_index), len(ACTIONS)),
+                          dtype=dtype)
+        names = []
+        session_players = []
+        for tensor in tensors:
+            rows = slice(len(names), len(names) + len(tensor.sessions))
+            values[rows, [player_index[player] for player in tensor.players]] = tensor.values
+            names.extend(tensor.sessions)
+            session_players.extend(tensor.session_players)
+        return cls(names, player_index, values, session_players).select(sessions)
+
+    def totals(self):
+        """Sumy dla całego wyboru: tablica gracze x akcje"""
+        return self.values.sum(axis=0)
+
+    def team(self):
+        """Sumy drużyny w każdej sesji: tablica sesje x akcje"""
+        return self.values.sum(axis=1)
+
+    def series(self, player, action):
+        """Wartości akcji gracza w kolejnych sesjach (zera, gdy gracza lub akcji brak)"""
+        p = self.player_index.get(player.lower())
+        a = ACTION_INDEX.get(action)
+        if p is None or a is None:
+            return np.zeros(len(self.sessions), dtype=self.values.dtype)
+        return self.values[:, p, a]
+
+    def merged(self):
+        """Sumy dla całego wyboru w postaci słowników, jak dawniej zwracało merge_stats"""
+        merged_stats = defaultdict(lambda: defaultdict(int))
+        for player, row in zip(self.players, self.totals().tolist()):
+            merged_stats[player].update(zip(ACTIONS, row))
+        return merged_stats
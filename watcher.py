@@ -0,0 +1,130 @@
+# watcher.py
+import os
+import threading
+from analysis import ingest_cache, load_session_stats
+from instrumentation import get_logger
+from prefix_index import PrefixIndex
+from roster_index import update_roster
+from session_catalog import SessionCatalog
+from stats_db import stats_db
+
+logger = get_logger("watcher")
+
+# Co ile sekund sprawdzać folder z plikami Excel
+WATCH_INTERVAL = 5.0
+
+
+def _list_workbooks(excel_folder):
+    """{nazwa pliku: (rozmiar, czas modyfikacji)} dla plików .xlsx w folderze"""
+    snapshot = {}
+    if os.path.exists(excel_folder):
+        with os.scandir(excel_folder) as entries:
+            for entry in entries:
+                if entry.name.endswith(".xlsx") and entry.is_file():
+                    stat = entry.stat()
+                    snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+class ExcelWatcher:
+    """Wątek w tle sprawdzający folder z plikami Excel.
+
+    Nowe i zmienione pliki są parsowane do cache'u statystyk, bazy i manifestu graczy poza
+    obsługą żądań, a katalog sesji (catalog), sumy narastające sezonu (index), lista
+    plików w kolejności chronologicznej (files) i lista graczy (players) są odświeżane
+    na bieżąco.
+    Każda zmiana zwiększa licznik version, po którym interfejs poznaje, że trzeba
+    odświeżyć listy.
+    """
+
+    def __init__(self, excel_folder="excel", interval=WATCH_INTERVAL):
+        self.excel_folder = excel_folder
+        self.interval = interval
+        # Szybki stan początkowy: katalog z manifestu graczy, bez parsowania arkuszy
+        self.catalog = SessionCatalog(excel_folder, ingest_cache())
+        roster = update_roster(excel_folder)
+        self.catalog.refresh(roster)
+        self.files = self.catalog.files()
+        self.players = sorted({player for names in roster.values() for player in names})
+        # Sumy narastające wszystkich sesji - wypełniane przy pierwszym sprawdzeniu folderu
+        self.index = PrefixIndex.from_stats([], [])
+        self.version = 0
+        self._snapshot = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def scan(self):
+        """Jedno sprawdzenie folderu; zwraca True, gdy coś się zmieniło"""
+        snapshot = _list_workbooks(self.excel_folder)
+        changed = [name for name, signature in snapshot.items() if self._snapshot.get(name) != signature]
+        removed = [name for name in self._snapshot if name not in snapshot]
+        if not changed and not removed:
+            return False
+
+        index = self.index
+        if changed:
+            # Parsowanie do cache'u i bazy - pierwsza analiza nowej sesji nie musi już otwierać pliku
+            paths = [os.path.join(self.excel_folder, name) for name in changed]
+            results, errors = load_session_stats(paths)
+            for path, error in errors.items():
+                logger.warning("Nie udało się wczytać %s: %s", os.path.basename(path), error)
+            loaded = [(name, stats) for name, stats in zip(changed, results) if stats is not None]
+            # Wersje, z których pochodzą wiersze bazy - indeks wie, dla jakiej zawartości plików jest aktualny
+            stored = stats_db.versions(paths)
+            versions = {name: stored[os.path.abspath(path)][0]
+                        for name, path in zip(changed, paths) if os.path.abspath(path) in stored}
+            if not index.sessions:
+                index = PrefixIndex.from_stats([name for name, _ in loaded], [stats for _, stats in loaded],
+                                               {name: versions.get(name) for name, _ in loaded})
+            else:
+                for name in changed:
+                    index = index.remove(name)
+                for name, stats in loaded:
+                    index = index.insert(name, stats, versions.get(name))
+        for name in removed:
+            index = index.remove(name)
+        if removed:
+            stats_db.remove([os.path.join(self.excel_folder, name) for name in removed])
+
+        roster = update_roster(self.excel_folder)
+        players = sorted({player for names in roster.values() for player in names})
+        self.catalog.refresh(roster)
+
+        self._snapshot = snapshot
+        self.index = index
+        self.files = self.catalog.files()
+        self.players = players
+        self.version += 1
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.scan()
+            except Exception:
+                logger.exception("Błąd podczas sprawdzania folderu '%s'", self.excel_folder)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="excel-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+
+def start_watcher(excel_folder="excel", interval=WATCH_INTERVAL):
+    """Zwraca działający obserwator folderu (jeden na folder w procesie)"""
+    with _watchers_lock:
+        if excel_folder not in _watchers:
+            _watchers[excel_folder] = ExcelWatcher(excel_folder, interval).start()
+        return _watchers[excel_folder]
@@ -0,0 +1,218 @@
+# workbook_loader.py
+import os
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+import openpyxl
+from instrumentation import stage_metrics
+
+# Ostatni wiersz zakładki 'suma' czytany przez process_stats
+SUMA_LAST_ROW = 25
+
+# Dostępne silniki wczytywania arkusza: pełne openpyxl albo bezpośredni parser XML
+ENGINES = ('openpyxl', 'xml')
+DEFAULT_ENGINE = 'openpyxl'
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+CELL_REF = re.compile(r'([A-Z]+)(\d+)')
+
+
+class SheetRows:
+    """Wczytane wiersze arkusza z interfejsem zgodnym z arkuszem openpyxl (iter_rows, max_row, max_column)"""
+
+    def __init__(self, rows):
+        width = max((len(row) for row in rows), default=0)
+        self.rows = [tuple(row) + (None,) * (width - len(row)) for row in rows]
+        self.max_row = len(self.rows)
+        self.max_column = width
+
+    def iter_rows(self, min_row=1, max_row=None, values_only=True):
+        # Zwracamy zawsze same wartości - tylko tego używa process_stats
+        if max_row is None:
+            max_row = self.max_row
+        for row in self.rows[min_row - 1:max_row]:
+            yield row
+
+
+def load_sheet(file_path, sheet_name, last_row, engine=DEFAULT_ENGINE):
+    """Wczytuje strumieniowo wiersze 1..last_row wskazanej zakładki; zwraca None gdy jej brak"""
+    if engine == 'xml':
+        with stage_metrics.span('workbook_open'):
+            return load_sheet_xml(file_path, sheet_name, last_row)
+    if engine != 'openpyxl':
+        raise ValueError(f"Nieznany silnik wczytywania: {engine}")
+    with stage_metrics.span('workbook_open'):
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            if sheet_name not in workbook.sheetnames:
+                return None
+            # W trybie read-only iter_rows przerywa parsowanie XML po wierszu max_row
+            rows = list(workbook[sheet_name].iter_rows(max_row=last_row, values_only=True))
+        finally:
+            # Zamykamy archiwum od razu, a nie dopiero przy sprzątaniu obiektu
+            workbook.close()
+        return SheetRows(rows)
+
+
+def load_suma_sheet(file_path, last_row=SUMA_LAST_ROW, engine=DEFAULT_ENGINE):
+    """Wczytuje strumieniowo tylko potrzebne wiersze zakładki 'suma'; zwraca None gdy jej brak"""
+    return load_sheet(file_path, "suma", last_row, engine)
+
+
+def _column_index(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index
+
+
+def _cast_number(value):
+    # Ta sama konwersja co w openpyxl: liczby całkowite zostają int
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+
+def _text_content(element):
+    # Tekst komórki lub wpisu sharedStrings bez fonetycznych dopisków (rPh)
+    parts = [element.findtext(f'{MAIN_NS}t') or '']
+    parts += [run.findtext(f'{MAIN_NS}t') or '' for run in element.iterfind(f'{MAIN_NS}r')]
+    return ''.join(parts)
+
+
+def _sheet_xml_path(archive, sheet_name):
+    """Ścieżka pliku XML arkusza o podanej nazwie wewnątrz archiwum .xlsx"""
+    workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+    rel_id = None
+    for sheet in workbook.iter(f'{MAIN_NS}sheet'):
+        if sheet.get('name') == sheet_name:
+            rel_id = sheet.get(f'{REL_NS}id')
+            break
+    if rel_id is None:
+        return None
+    rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    for rel in rels.iter(f'{PKG_REL_NS}Relationship'):
+        if rel.get('Id') == rel_id:
+            target = rel.get('Target')
+            if target.startswith('/'):
+                return target.lstrip('/')
+            return posixpath.normpath(posixpath.join('xl', target))
+    return None
+
+
+def _shared_strings(archive, needed):
+    """Czyta z sharedStrings.xml tylko wpisy o podanych indeksach i kończy po ostatnim z nich"""
+    strings = {}
+    if not needed:
+        return strings
+    last_needed = max(needed)
+    with archive.open('xl/sharedStrings.xml') as source:
+        index = 0
+        for _, element in ET.iterparse(source, events=('end',)):
+            if element.tag != f'{MAIN_NS}si':
+                continue
+            if index in needed:
+                strings[index] = _text_content(element)
+            element.clear()
+            if index >= last_needed:
+                break
+            index += 1
+    return strings
+
+
+def load_sheet_xml(file_path, sheet_name, last_row):
+    """Wczytuje wiersze arkusza bezpośrednio z XML w archiwum .xlsx, z pominięciem openpyxl.
+
+    Zwraca te same wartości co openpyxl w trybie data_only (bez konwersji dat,
+    których układ arkusza nie używa) albo None, gdy arkusza nie ma.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        sheet_path = _sheet_xml_path(archive, sheet_name)
+        if sheet_path is None:
+            return None
+
+        rows = []
+        shared = set()
+        with archive.open(sheet_path) as source:
+            row_number = 0
+            cells = None
+            for event, element in ET.iterparse(source, events=('start', 'end')):
+                tag = element.tag
+                if event == 'start':
+                    if tag == f'{MAIN_NS}row':
+                        row_number = int(element.get('r', row_number + 1))
+                        if row_number > last_row:
+                            break
+                        cells = {}
+                        column = 0
+                    continue
+
+                if tag == f'{MAIN_NS}c' and cells is not None:
+                    ref = element.get('r')
+                    column = _column_index(CELL_REF.match(ref).group(1)) if ref else column + 1
+                    data_type = element.get('t', 'n')
+                    if data_type == 'inlineStr':
+                        inline = element.find(f'{MAIN_NS}is')
+                        value = _text_content(inline) if inline is not None else None
+                    else:
+                        value = element.findtext(f'{MAIN_NS}v') or None
+                    if value is not None:
+                        if data_type == 'n':
+                            value = _cast_number(value)
+                        elif data_type == 's':
+                            value = int(value)
+                            shared.add(value)
+                            data_type = ('s', value)
+                        elif data_type == 'b':
+                            value = bool(int(value))
+                    cells[column] = (value, data_type)
+                    element.clear()
+                elif tag == f'{MAIN_NS}row':
+                    width = max(cells, default=0)
+                    while len(rows) < row_number - 1:
+                        rows.append(())
+                    rows.append([cells.get(col, (None, 'n')) for col in range(1, width + 1)])
+                    cells = None
+                    element.clear()
+
+        strings = _shared_strings(archive, shared)
+
+    resolved = []
+    for row in rows:
+        resolved.append(tuple(strings[data_type[1]] if isinstance(data_type, tuple) else value
+                              for value, data_type in row))
+    return SheetRows(resolved)
+
+
+def compare_engines(excel_folder="excel"):
+    """Porównuje wyniki process_stats dla obu silników na plikach z folderu; zwraca listę niezgodnych plików"""
+    from stats_processing import process_stats
+
+    mismatches = []
+    for file in sorted(os.listdir(excel_folder)):
+        if not file.endswith(".xlsx"):
+            continue
+        file_path = os.path.join(excel_folder, file)
+        results = []
+        for engine in ENGINES:
+            sheet = load_suma_sheet(file_path, engine=engine)
+            stats = process_stats(sheet) if sheet is not None else None
+            results.append(None if stats is None else {player: dict(values) for player, values in stats.items()})
+        if any(result != results[0] for result in results[1:]):
+            mismatches.append(file)
+    return mismatches
+
+
+if __name__ == "__main__":
+    # Sprawdzenie zgodności silników: python workbook_loader.py [folder]
+    import sys
+
+    folder = sys.argv[1] if len(sys.argv) > 1 else "excel"
+    mismatches = compare_engines(folder)
+    if mismatches:
+        print("Niezgodne wyniki silników dla plików: " + ", ".join(mismatches))
+        sys.exit(1)
+    print(f"Silniki {', '.join(ENGINES)} dają identyczne statystyki dla plików w '{folder}'")